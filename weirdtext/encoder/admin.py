@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import EncodedDocument
+
+
+@admin.register(EncodedDocument)
+class EncodedDocumentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'mode', 'word_count', 'created_at', 'used_at')
+    list_filter = ('mode',)
+    readonly_fields = ('id', 'created_at')
@@ -0,0 +1,109 @@
+"""
+Input limits and admission control based on estimated encoder cost.
+
+Cost of a request is estimated from number of tokens of its texts (at least
+their length divided by CHARS_PER_TOKEN), number of times the original text is
+encoded and length of its word list (or of permutation hints and the longest word).
+Requests over the limits are rejected with 413, requests which would exceed cost
+of all requests in flight wait up to QUEUE_TIMEOUT and then are rejected with 429
+and Retry-After (WEIRDTEXT_LIMITS settings).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+
+
+class Rejected(Exception):
+    """Request is not admitted, `status` and `headers` describe the response."""
+    status = status.HTTP_429_TOO_MANY_REQUESTS
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(settings.WEIRDTEXT_LIMITS['RETRY_AFTER'])}
+
+
+class TooExpensive(Rejected):
+    """Request is over the limits, it won't be admitted later either."""
+    status = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    @property
+    def headers(self):
+        return {}
+
+
+# the encoder work is linear in text length, texts with few whitespaces
+# (e.g. words joined with punctuation) are charged by their length
+CHARS_PER_TOKEN = 5
+
+
+def estimate_tokens(text):
+    """
+    Return estimated number of words in text: number of whitespace separated
+    parts, but at least length of text divided by CHARS_PER_TOKEN.
+    """
+    if not text:
+        return 0
+    return max(text.count(" ") + text.count("\n") + text.count("\t") + 1,\
+        -(-len(text) // CHARS_PER_TOKEN))
+
+
+def encode_cost(original_text, hints=False):
+    """
+    Return estimated cost of encoding, raise TooExpensive when it's over the limits.
+    With `hints` length of the longest word is added, its permutation is the largest.
+    """
+    tokens = estimate_tokens(original_text)
+    if tokens > settings.WEIRDTEXT_LIMITS['MAX_TOKENS']:
+        raise TooExpensive()
+    if hints:
+        tokens += max(map(len, original_text.split()), default=0)
+    return tokens
+
+
+def decode_cost(original_text, word_count, encodes=1):
+    """
+    Return estimated cost of decoding (`encodes` times encoding to check input,
+    word list index and matching), raise TooExpensive when it's over the limits.
+    """
+    if word_count > settings.WEIRDTEXT_LIMITS['MAX_WORD_LIST']:
+        raise TooExpensive()
+    return (encodes + 1) * encode_cost(original_text) + word_count
+
+
+class AdmissionController:
+    """Keep total cost of requests in flight under MAX_COST_IN_FLIGHT."""
+    def __init__(self):
+        self.cost_in_flight = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def admit(self, cost, timeout=None):
+        """
+        Context manager reserving cost for the request.
+        Waits for capacity up to `timeout` (QUEUE_TIMEOUT by default) seconds.
+        Request alone is always admitted if it's under MAX_REQUEST_COST.
+        """
+        limits = settings.WEIRDTEXT_LIMITS
+        if cost > limits['MAX_REQUEST_COST']:
+            raise TooExpensive()
+        deadline = time.monotonic() + (limits['QUEUE_TIMEOUT'] if timeout is None else timeout)
+        with self._condition:
+            while self.cost_in_flight and\
+                self.cost_in_flight + cost > limits['MAX_COST_IN_FLIGHT']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Rejected()
+                self._condition.wait(remaining)
+            self.cost_in_flight += cost
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.cost_in_flight -= cost
+                self._condition.notify_all()
+
+
+admission = AdmissionController()
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import setting_changed
+
+
+def update_metrics_enabled(setting, value, **kwargs):  # pylint: disable=unused-argument
+    from . import metrics  # pylint: disable=import-outside-toplevel
+    if setting == 'WEIRDTEXT_METRICS_ENABLED':
+        metrics.ENABLED = bool(value)
 
 
 class EncoderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'encoder'
+
+    def ready(self):
+        update_metrics_enabled('WEIRDTEXT_METRICS_ENABLED', settings.WEIRDTEXT_METRICS_ENABLED)
+        setting_changed.connect(update_metrics_enabled)
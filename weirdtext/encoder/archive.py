@@ -0,0 +1,110 @@
+"""
+Encoding of huge on-disk texts without reading them into memory.
+
+Input file is memory-mapped and decoded from UTF-8 block by block, encoded text
+is written to the output through a buffer and the word list is spilled to disk
+in sorted runs when it's over the memory budget, then merged (external sort).
+"""
+import codecs
+import heapq
+import json
+import mmap
+import os
+import tempfile
+
+from .encoder import iter_encode, SHUFFLE_BOUNDED
+
+
+# estimated memory of one word in the list besides its characters
+WORD_OVERHEAD = 56
+
+
+def iter_mmap_text(path, block_size=1 << 20):
+    """Yield text of UTF-8 file block by block, read from memory map of the file."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as text_file:
+        if os.fstat(text_file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), block_size):
+                text = decoder.decode(data[start:start + block_size])
+                if text:
+                    yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+class SpilledWordList:
+    """
+    Word list which keeps at most `memory_budget` bytes (estimated) of words
+    in memory. Over the budget words are sorted (`str.lower` key, like
+    word_list of the encoder) and written to a temporary file in `directory`.
+    `sorted_words` merges the files lazily, the order is the same as of
+    stable in-memory sort of all words.
+    Use as context manager to remove the temporary files.
+    """
+    def __init__(self, memory_budget=256 * 1024 * 1024, directory=None):
+        self.memory_budget = memory_budget
+        self._directory = tempfile.TemporaryDirectory(prefix="weirdtext-words-", dir=directory)
+        self._words = []
+        self._size = 0
+        self._runs = []
+        self.count = 0
+
+    def append(self, word):
+        self._words.append(word)
+        self._size += len(word) + WORD_OVERHEAD
+        self.count += 1
+        if self._size > self.memory_budget:
+            self._spill()
+
+    def _spill(self):
+        self._words.sort(key=lambda s: s.lower())
+        path = os.path.join(self._directory.name, f"run-{len(self._runs)}.txt")
+        with open(path, "w", encoding="utf-8", newline="\n") as run_file:
+            # words are `\w+` tokens, they never contain a new line
+            run_file.writelines(word + "\n" for word in self._words)
+        self._runs.append(path)
+        self._words = []
+        self._size = 0
+
+    @staticmethod
+    def _iter_run(path):
+        with open(path, encoding="utf-8", newline="\n") as run_file:
+            for line in run_file:
+                yield line[:-1]
+
+    def sorted_words(self):
+        """Yield all words sorted with `str.lower` key."""
+        self._words.sort(key=lambda s: s.lower())
+        # runs are in text order, merge keeps the order of equal words
+        return heapq.merge(*(self._iter_run(path) for path in self._runs), self._words,\
+            key=lambda s: s.lower())
+
+    def close(self):
+        self._directory.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def encode_file(input_path, output_file, mode=SHUFFLE_BOUNDED, block_size=1 << 20,\
+    memory_budget=256 * 1024 * 1024, directory=None):
+    """
+    Encode UTF-8 file and write JSON object with `encoded_text` and `word_list`
+    (the same as `weirdtext_encoder` returns) to text `output_file`.
+    Returns number of words in the word list.
+    """
+    with SpilledWordList(memory_budget, directory) as words:
+        output_file.write('{"encoded_text": "')
+        for piece in iter_encode(iter_mmap_text(input_path, block_size), words, mode=mode):
+            output_file.write(json.dumps(piece, ensure_ascii=False)[1:-1])
+        output_file.write('", "word_list": [')
+        for index, word in enumerate(words.sorted_words()):
+            output_file.write((", " if index else "") + json.dumps(word, ensure_ascii=False))
+        output_file.write(']}')
+        return words.count
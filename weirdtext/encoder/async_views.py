@@ -0,0 +1,147 @@
+"""
+Async variants of encode/decode views for ASGI server.
+
+CPU bound encoder work is done in bounded executor (WEIRDTEXT_ASYNC settings),
+so event loop keeps serving other requests. When more than MAX_PENDING calls
+are waiting or running, request is rejected with 503 and Retry-After header.
+Identical concurrent requests wait for one executor call (WEIRDTEXT_SINGLE_FLIGHT).
+Admission control doesn't wait for capacity here, so event loop is never blocked.
+Results aren't stored (`store` is rejected with 400), the async server has no database
+shared with `/v1/decode/<id>/`.
+"""
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+
+from .admission import admission, encode_cost, Rejected
+from .singleflight import AsyncSingleFlight
+from .views import validate_encode_data, validate_decode_data, encode_result, decode_result,\
+    request_decode_cost, encode_flight_key, decode_flight_key, SHUFFLE_BOUNDED
+
+
+class Overloaded(Exception):
+    """Too many encoder calls are waiting for executor."""
+
+
+_executor = None
+_pending = 0
+single_flight = AsyncSingleFlight()
+
+
+def get_executor():
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        config = settings.WEIRDTEXT_ASYNC
+        executor_class = ProcessPoolExecutor if config['EXECUTOR'] == 'process'\
+            else ThreadPoolExecutor
+        _executor = executor_class(max_workers=config['WORKERS'])
+    return _executor
+
+
+async def run_in_executor(function, *args):
+    """Run function in executor, raise Overloaded when queue is full."""
+    global _pending  # pylint: disable=global-statement
+    if _pending >= settings.WEIRDTEXT_ASYNC['MAX_PENDING']:
+        raise Overloaded()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(),\
+            partial(function, *args))
+    finally:
+        _pending -= 1
+
+
+async def run_admitted(cost, function, *args):
+    """Run function in executor when admission control admits cost without waiting."""
+    with admission.admit(cost, timeout=0):
+        return await run_in_executor(function, *args)
+
+
+async def run_coalesced(key, cost, function, *args):
+    """
+    `run_admitted`, concurrent calls with the same key wait for the running call
+    when WEIRDTEXT_SINGLE_FLIGHT is enabled, see `views.coalesced`.
+    """
+    if settings.WEIRDTEXT_SINGLE_FLIGHT['ENABLED']:
+        return await single_flight.do(key, run_admitted, cost, function, *args)
+    return await run_admitted(cost, function, *args)
+
+
+def parse_json(request):
+    """Return parsed JSON object of request body, None if body isn't JSON object."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def overloaded_response():
+    response = HttpResponse(status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(settings.WEIRDTEXT_ASYNC['RETRY_AFTER'])
+    return response
+
+
+def rejected_response(exc):
+    response = HttpResponse(status=exc.status)
+    for header, value in exc.headers.items():
+        response[header] = value
+    return response
+
+
+def json_response(data):
+    return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+
+
+async def encode_view(request):
+    """Async version of `POST /v1/encode/`, see EncodeApi."""
+    if request.method != "POST":
+        return HttpResponse(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    data = parse_json(request)
+    error_status = status.HTTP_400_BAD_REQUEST if data is None else validate_encode_data(data)
+    if error_status is None and data.get('store', False):
+        error_status = status.HTTP_400_BAD_REQUEST
+    if error_status is not None:
+        return HttpResponse(status=error_status)
+
+    original_text, mode = data['original_text'], data.get('mode', SHUFFLE_BOUNDED)
+    options = (data.get('word_runs', False), data.get('hints', False))
+    try:
+        return json_response(await run_coalesced(encode_flight_key(original_text, mode, *options),\
+            encode_cost(original_text, options[1]), encode_result, original_text, mode, 1,\
+            *options))
+    except Rejected as exc:
+        return rejected_response(exc)
+    except Overloaded:
+        return overloaded_response()
+
+
+async def decode_view(request):
+    """Async version of `POST /v1/decode/`, see DecodeApi."""
+    if request.method != "POST":
+        return HttpResponse(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    data = parse_json(request)
+    error_status = status.HTTP_400_BAD_REQUEST if data is None else validate_decode_data(data)
+    if error_status is not None:
+        return HttpResponse(status=error_status)
+
+    try:
+        return json_response(await run_coalesced(decode_flight_key(data),\
+            request_decode_cost(data), decode_result, data))
+    except Rejected as exc:
+        return rejected_response(exc)
+    except Overloaded:
+        return overloaded_response()
+    except ValueError:
+        return JsonResponse("Incorrect encoded text", safe=False,\
+            status=status.HTTP_400_BAD_REQUEST)
+
+
+# stateless JSON API, the same as DRF APIView
+encode_view.csrf_exempt = True
+decode_view.csrf_exempt = True
@@ -0,0 +1,159 @@
+import json
+import random
+import time
+import tracemalloc
+
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from .encoder import weirdtext_encoder, weirdtext_decoder
+
+
+# letters used by generated words of every distribution
+ALPHABETS = {
+    "latin": "abcdefghijklmnopqrstuvwxyz",
+    "unicode": "abcdefghijklmnopqrstuvwxyząćęłńóśźżабвгдежзиклмнопрстуфхαβγδεζηθικλμνξπρστ"
+        "日本語漢字",
+}
+PUNCTUATION = [" ", " ", " ", ", ", ". ", "; ", "! ", " (", ") ", " - ", "\n"]
+
+
+def generate_corpus(words, distribution, seed=0):
+    """
+    Return synthetic text with given number of words.
+    Distributions:
+        :latin - latin letters, word length 1-12, sparse punctuation
+        :repeated - small vocabulary (50 words) repeated over the whole text
+        :unicode - latin, polish, cyrillic, greek and CJK letters
+        :punctuation - punctuation mark after every word
+    """
+    rng = random.Random(seed)
+    alphabet = ALPHABETS["unicode" if distribution == "unicode" else "latin"]
+
+    def word():
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+
+    vocabulary = [word() for _ in range(50)] if distribution == "repeated" else None
+    separators = PUNCTUATION[3:] if distribution == "punctuation" else PUNCTUATION
+    pieces = []
+    for _ in range(words):
+        pieces.append(rng.choice(vocabulary) if vocabulary else word())
+        pieces.append(rng.choice(separators))
+    return "".join(pieces)
+
+
+def percentile(values, fraction):
+    """Return value at given fraction of sorted values (nearest rank)."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def measure(function, repeat):
+    """
+    Call function `repeat` times and return latency percentiles (seconds)
+    and peak memory (bytes) of one more call traced with tracemalloc.
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "peak_memory": peak_memory,
+    }
+
+
+def benchmark_targets(text):
+    """Return dict of named functions to benchmark for given text."""
+    factory = APIRequestFactory()
+    encoded_text, word_list = weirdtext_encoder(text)
+    encode_body = json.dumps({"original_text": text})
+    decode_body = json.dumps({"encoded_text": encoded_text, "word_list": word_list,\
+        "original_text": text})
+    # imported here, views import settings dependent modules
+    from .views import EncodeApi, DecodeApi  # pylint: disable=import-outside-toplevel
+    encode_view, decode_view = EncodeApi.as_view(), DecodeApi.as_view()
+
+    return {
+        "encoder": lambda: weirdtext_encoder(text),
+        "decoder": lambda: weirdtext_decoder(encoded_text, word_list, text),
+        "encode_view": lambda: encode_view(factory.post("/v1/encode/", encode_body,\
+            content_type="application/json")).render(),
+        "decode_view": lambda: decode_view(factory.post("/v1/decode/", decode_body,\
+            content_type="application/json")).render(),
+    }
+
+
+def benchmark_overhead(repeat, words=10):
+    """
+    Measure whole requests (with the middleware chain) of DRF views and of
+    fast path views (encoder/fast_views.py) on a short text, so the latency
+    is mostly per-request overhead. Result cache is disabled.
+
+    Returns dict {"encode" or "decode": {"drf": measurements, "fast": measurements}}.
+    """
+    text = generate_corpus(words, "latin")
+    encoded_text, word_list = weirdtext_encoder(text)
+    bodies = {
+        "encode": json.dumps({"original_text": text}),
+        "decode": json.dumps({"encoded_text": encoded_text, "word_list": word_list,\
+            "original_text": text}),
+    }
+    client = Client()
+    results = {}
+    with override_settings(ALLOWED_HOSTS=["testserver"], WEIRDTEXT_RESULT_CACHE={'BACKEND': None}):
+        for name, body in bodies.items():
+            results[name] = {
+                variant: measure(lambda path=path, body=body: client.post(path, body,\
+                    content_type="application/json"), repeat)
+                for variant, path in (("drf", f"/v1/{name}/"), ("fast", f"/v1/fast/{name}/"))
+            }
+    return results
+
+
+def run_benchmarks(sizes, distributions, repeat, targets=None):
+    """
+    Run benchmarks for every corpus size and distribution.
+    Result cache is disabled, so every call does the full work.
+
+    Returns dict {"target/distribution/size": measurements}, measurements contain
+    also throughput in characters per second (for p50 latency).
+    """
+    results = {}
+    with override_settings(WEIRDTEXT_RESULT_CACHE={'BACKEND': None}):
+        for distribution in distributions:
+            for size in sizes:
+                text = generate_corpus(size, distribution)
+                for name, function in benchmark_targets(text).items():
+                    if targets and name not in targets:
+                        continue
+                    measurements = measure(function, repeat)
+                    measurements["throughput"] = len(text) / max(measurements["p50"], 1e-9)
+                    results[f"{name}/{distribution}/{size}"] = measurements
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compare results with baseline and return list of descriptions of latencies
+    and memory peaks which are worse than baseline by more than `threshold` (fraction).
+    Cases missing in the baseline are skipped.
+    """
+    regressions = []
+    for case, measurements in results.items():
+        for metric in ("p50", "p99", "peak_memory"):
+            expected = baseline.get(case, {}).get(metric)
+            if expected and measurements[metric] > expected * (1 + threshold):
+                regressions.append(f"{case} {metric}: {measurements[metric]:.6g}"\
+                    f" > {expected:.6g} (+{measurements[metric] / expected - 1:.0%})")
+    return regressions
@@ -0,0 +1,155 @@
+"""
+Bulk encoding and decoding of JSONL files, one `/v1/encode/` or `/v1/decode/`
+request body per line, used by `weirdtext_encode` and `weirdtext_decode` commands.
+
+Records are read, processed and written one by one, at most `window` records
+are in flight, so memory doesn't depend on size of the file. Functions run
+in worker processes use only the encoder, Django doesn't have to be set up there.
+"""
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .encoder import weirdtext_encoder, weirdtext_decoder, weirdtext_digest, word_runs,\
+    expand_word_runs, weirdtext_hints, weirdtext_hints_digest, weirdtext_hint_decoder,\
+    SHUFFLE_BOUNDED
+
+
+def encoded_result(encoded_text, word_list, original_text, key, runs=False, hints=False):
+    """
+    Return data of encode response, with `word_runs` instead of `word_list` if runs is set,
+    or with permutation `hints` (and their digest) instead of word list if hints is set.
+    """
+    if hints:
+        hints = weirdtext_hints(original_text, encoded_text)
+        return {
+            "encoded_text": encoded_text,
+            "hints": hints,
+            "digest": weirdtext_hints_digest(encoded_text, hints, key),
+        }
+    return {
+        "encoded_text": encoded_text,
+        **({"word_runs": word_runs(word_list)} if runs else {"word_list": word_list}),
+        "digest": weirdtext_digest(encoded_text, word_list, original_text, key),
+    }
+
+
+def encode_record(data, key):
+    """Return result of `/v1/encode/` for correct request body."""
+    encoded_text, word_list = weirdtext_encoder(data['original_text'],\
+        mode=data.get('mode', SHUFFLE_BOUNDED))
+    return encoded_result(encoded_text, word_list, data['original_text'], key,\
+        data.get('word_runs', False), data.get('hints', False))
+
+
+def decode_record(data, key):
+    """Return result of `/v1/decode/` for correct request body, `{"error": 400}` if incorrect."""
+    try:
+        if "hints" in data.keys():
+            decoded_text = weirdtext_hint_decoder(data['encoded_text'], data['hints'],\
+                data['digest'], key)
+        else:
+            word_list = data['word_list'] if "word_list" in data.keys()\
+                else expand_word_runs(data['word_runs'])
+            decoded_text = weirdtext_decoder(data['encoded_text'], word_list,\
+                data['original_text'], digest=data.get('digest'), key=key, mode=data.get('mode'))
+    except ValueError:
+        return {"error": 400}
+    return {"decoded_text": decoded_text}
+
+
+def parse_records(lines, validate, defaults=None):
+    """
+    Yield (data, error) for every non-empty JSONL line. Error is status
+    returned by `validate` (None for correct data), 400 for incorrect JSON.
+    Missing keys of data are taken from `defaults`.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield None, 400
+            continue
+        if not isinstance(data, dict):
+            yield None, 400
+            continue
+        data = {**(defaults or {}), **data}
+        yield data, validate(data)
+
+
+def ordered_map(function, records, key, executor=None, window=1):
+    """
+    Yield `function(data, key)` for correct records and `{"error": status}`
+    for incorrect ones, in the order of records.
+    With executor at most `window` records are submitted and not yielded yet.
+    """
+    pending = deque()
+    for data, error in records:
+        if error is not None:
+            future = Future()
+            future.set_result({"error": error})
+        elif executor is None:
+            future = Future()
+            future.set_result(function(data, key))
+        else:
+            future = executor.submit(function, data, key)
+        pending.append(future)
+        while len(pending) >= window or pending and pending[0].done():
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Progress:
+    """Count read bytes and written records, report throughput every `interval` seconds."""
+    def __init__(self, write, interval=5):
+        self.write = write
+        self.interval = interval
+        self.size = 0
+        self.records = 0
+        self.errors = 0
+        self.start = self._last_report = time.perf_counter()
+
+    def read(self, lines):
+        """Yield lines and count their size."""
+        for line in lines:
+            self.size += len(line)
+            yield line
+
+    def done(self, result):
+        self.records += 1
+        self.errors += "error" in result
+        if self.interval and time.perf_counter() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        self._last_report = time.perf_counter()
+        elapsed = max(self._last_report - self.start, 1e-9)
+        self.write(f"{self.records} records ({self.errors} errors), "\
+            f"{self.size / 2 ** 20:.1f} MiB in {elapsed:.1f} s: "\
+            f"{self.records / elapsed:.1f} records/s, {self.size / 2 ** 20 / elapsed:.2f} MiB/s")
+
+
+def process_jsonl(input_file, output_file, function, validate, key, workers=1, window=None,\
+    progress=None, defaults=None):
+    """
+    Process JSONL records of binary `input_file` with `function` (`encode_record`
+    or `decode_record`) and write results as JSONL lines to text `output_file`.
+    Records are processed in `workers` processes, result lines are in input order.
+    """
+    lines = progress.read(input_file) if progress is not None else input_file
+    records = parse_records(lines, validate, defaults)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for result in ordered_map(function, records, key, executor, window or 4 * workers):
+            output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            if progress is not None:
+                progress.done(result)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if progress is not None:
+        progress.report()
@@ -0,0 +1,200 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .encoder import weirdtext_encoder, weirdtext_decoder, SHUFFLE_BOUNDED
+from .singleflight import FileLock, fcntl
+
+
+def result_key(kind, *parts):
+    """Return cache key made of hash of all parts (strings or lists of strings)."""
+    content_hash = hashlib.sha256()
+    for part in parts:
+        for item in (part if isinstance(part, list) else [part]):
+            # non-string items (incorrect input) must not share key with strings
+            data = (item if isinstance(item, str) else repr(item)).encode('utf-8', 'surrogatepass')
+            content_hash.update(b's' if isinstance(item, str) else b'r')
+            content_hash.update(len(data).to_bytes(8, 'big'))
+            content_hash.update(data)
+        content_hash.update(b'|')
+    return f"weirdtext:{kind}:{content_hash.hexdigest()}"
+
+
+def result_size(value):
+    """Return approximate memory used by the cached result in bytes."""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    return sum(result_size(item) for item in value)
+
+
+class LRUResultCache:
+    """
+    In-process cache of encoder results with LRU eviction.
+    Least recently used results are evicted when there are more than
+    `max_entries` results or they use more than `max_bytes`.
+    """
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._results:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key][0]
+
+    def set(self, key, value):
+        size = result_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._results:
+                self.size -= self._results.pop(key)[1]
+            self._results[key] = (value, size)
+            self.size += size
+            while len(self._results) > self.max_entries or self.size > self.max_bytes:
+                self.size -= self._results.popitem(last=False)[1][1]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,\
+            "entries": len(self._results), "bytes": self.size}
+
+
+class DjangoResultCache:
+    """
+    Cache of encoder results stored in Django cache framework,
+    e.g. locmem or file-based backend from `CACHES[alias]`.
+    Eviction is done by the backend (its MAX_ENTRIES option),
+    results bigger than `max_bytes` are not stored.
+    """
+    def __init__(self, alias='default', timeout=None, max_bytes=64 * 1024 * 1024):
+        self.alias = alias
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = caches[self.alias].get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if result_size(value) <= self.max_bytes:
+            caches[self.alias].set(key, value, timeout=self.timeout)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_result_cache = None
+
+
+def get_result_cache():
+    """Return result cache configured in `WEIRDTEXT_RESULT_CACHE`, None if disabled."""
+    global _result_cache  # pylint: disable=global-statement
+    config = settings.WEIRDTEXT_RESULT_CACHE
+    if _result_cache is None and config.get('BACKEND'):
+        _result_cache = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _result_cache
+
+
+@receiver(setting_changed)
+def reset_result_cache(setting, **kwargs):  # pylint: disable=unused-argument
+    global _result_cache  # pylint: disable=global-statement
+    if setting == 'WEIRDTEXT_RESULT_CACHE':
+        _result_cache = None
+
+
+_file_lock_state = threading.local()
+
+
+def computed(cache, key, function, *args, **kwargs):
+    """
+    Return result of `function(*args, **kwargs)`, which stores it in result cache
+    under key. With WEIRDTEXT_SINGLE_FLIGHT['LOCK_DIRECTORY'] concurrent calls
+    of other processes with the same key are coalesced: they wait for the lock
+    and take the result from the cache. When the lock isn't acquired (timeout,
+    unusable lock directory) the function is called without it.
+
+    Nested calls (decode encoding original text) run unlocked, a thread holds
+    at most one lock, so it can't wait for a stripe it or the other process holds.
+    """
+    config = settings.WEIRDTEXT_SINGLE_FLIGHT
+    if not config['ENABLED'] or not config.get('LOCK_DIRECTORY') or fcntl is None\
+        or getattr(_file_lock_state, 'held', False):
+        return function(*args, **kwargs)
+    with FileLock(config['LOCK_DIRECTORY'], key, config['LOCK_STRIPES'],\
+        config['LOCK_TIMEOUT']) as lock:
+        result = cache.get(key) if lock.contended else None
+        if result is not None:
+            return result
+        if not lock.acquired:
+            return function(*args, **kwargs)
+        _file_lock_state.held = True
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _file_lock_state.held = False
+
+
+def cached_encode(original_text, mode=SHUFFLE_BOUNDED, workers=1):
+    """`weirdtext_encoder` with results memoized in result cache."""
+    cache = get_result_cache()
+    if cache is None:
+        return weirdtext_encoder(original_text, mode=mode, workers=workers)
+
+    key = result_key('encode', mode, original_text)
+
+    def encode():
+        result = weirdtext_encoder(original_text, mode=mode, workers=workers)
+        cache.set(key, result)
+        return result
+    result = cache.get(key)
+    if result is None:
+        result = computed(cache, key, encode)
+    encoded_text, word_list = result
+    return encoded_text, list(word_list)
+
+
+def cached_decode(encoded_text, word_list, original_text, digest=None, key=None, mode=None):
+    """
+    `weirdtext_decoder` with results memoized in result cache.
+    Encoding of original_text needed to check input without digest is cached too.
+    Only correctly decoded texts are stored.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return weirdtext_decoder(encoded_text, word_list, original_text, digest, key, mode=mode)
+
+    # digest is checked with the key, results checked with other key aren't shared
+    cache_key = result_key('decode', encoded_text, word_list, original_text, digest or "",\
+        mode or "", key.hex() if key else "")
+
+    def decode():
+        decoded_text = weirdtext_decoder(encoded_text, word_list, original_text, digest, key,\
+            encoder=cached_encode, mode=mode)
+        cache.set(cache_key, decoded_text)
+        return decoded_text
+    decoded_text = cache.get(cache_key)
+    if decoded_text is None:
+        decoded_text = computed(cache, cache_key, decode)
+    return decoded_text
@@ -0,0 +1,85 @@
+"""
+gzip and zstd content codings of request and response bodies.
+
+zstd is optional, it's supported only when `zstandard` package is installed.
+"""
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# preferred coding first
+CONTENT_CODINGS = (("zstd",) if zstandard is not None else ()) + ("gzip",)
+
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error)\
+    + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def choose_coding(accept_encoding):
+    """Return preferred coding accepted by `Accept-Encoding` header, None if there is none."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for coding in CONTENT_CODINGS:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def compress(data, coding):
+    if coding == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def compress_sequence(sequence, coding):
+    """Compress iterable of bytes on the fly, flushing after every item."""
+    if coding == "zstd":
+        compressor = zstandard.ZstdCompressor().compressobj()
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        flush_mode = zlib.Z_SYNC_FLUSH
+    for item in sequence:
+        data = compressor.compress(item) + compressor.flush(flush_mode)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def decompressing_reader(stream, coding):
+    """Return file-like object reading decompressed data of stream."""
+    if coding == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+    return gzip.GzipFile(fileobj=stream, mode="rb")
+
+
+def decompress(data, coding, max_size):
+    """
+    Return decompressed data, None if it's longer than max_size bytes.
+    Raises one of DECOMPRESSION_ERRORS for incorrect data.
+    """
+    reader = decompressing_reader(io.BytesIO(data), coding)
+    blocks = []
+    size = 0
+    while size <= max_size:
+        block = reader.read(max_size + 1 - size)
+        if not block:
+            return b"".join(blocks)
+        blocks.append(block)
+        size += len(block)
+    return None
@@ -1,11 +1,38 @@
 #!/usr/bin/env python3
-import copy
+import base64
+import binascii
+import hashlib
+import heapq
+import hmac
+import multiprocessing
 import random
 import re
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import chain, groupby, repeat
+
+from . import metrics
 
 
 no_punctation_token = re.compile(r'(\w+)', re.U)
+is_word_character = re.compile(r'\w', re.U).fullmatch
 SEPARATOR = "\n--weird--\n"
+# seed of the random generator owned by every `weirdtext_encoder` call
+ENCODER_SEED = 30
+# `bounded` draws one sample per word, `legacy` reproduces first encoder version,
+# `local` shuffles every word independently of the rest of text (see `weirdtext_reencode`)
+SHUFFLE_BOUNDED = "bounded"
+SHUFFLE_LEGACY = "legacy"
+SHUFFLE_LOCAL = "local"
+SHUFFLE_MODES = (SHUFFLE_BOUNDED, SHUFFLE_LEGACY, SHUFFLE_LOCAL)
+# modes tried by decoder without digest when the mode isn't given,
+# payloads of clients which don't send it are `bounded` or first version output
+DECODER_FALLBACK_MODES = (SHUFFLE_BOUNDED, SHUFFLE_LEGACY)
+# words starting in every `ENCODER_SHARD_SIZE` characters have own random generator
+ENCODER_SHARD_SIZE = 1 << 20
 
 def word_suitable_for_shuffle(word):
     """
@@ -14,59 +41,455 @@ def word_suitable_for_shuffle(word):
     """
     # 4 digits is minimum to make shuffle possibly
     # skip punctations marks
-    if len(word) < 4 or re.match(no_punctation_token, word) is None:
+    if len(word) < 4 or no_punctation_token.match(word) is None:
         return False
-    middle_of_the_word = word[1:-1]
     # check if middle of the word doesn't contains repeated one letter
-    if middle_of_the_word == len(middle_of_the_word) * middle_of_the_word[0]:
-        return False
-    return True
+    return word.count(word[1], 1, -1) != len(word) - 2
+
+
+def scan_words(text):
+    """
+    Single pass scanner of the words in the text (the same as `\\w+` tokens
+    of `re.split(no_punctation_token, text)`).
+
+    Yields (start, end, suitable) for every word, where `suitable` is the result
+    of `word_suitable_for_shuffle` computed on the span, without new strings.
+    """
+    count = text.count
+    for match in no_punctation_token.finditer(text):
+        start, end = match.span()
+        yield start, end, end - start > 3\
+            and count(text[start + 1], start + 1, end - 1) != end - start - 2
+
+
+def shuffle_middle(middle, rng):
+    """
+    Return shuffled middle of the word, always different than given one.
+
+    Letters are sampled only once. When the sample happens to keep original
+    order, first letter is swapped with the first different letter, so work
+    per word is bounded. `middle` can't be one repeated letter.
+    """
+    letters = rng.sample(middle, len(middle))
+    shuffled = ''.join(letters)
+    if shuffled == middle:
+        j = next(i for i, letter in enumerate(middle) if letter != middle[0])
+        letters[0], letters[j] = letters[j], letters[0]
+        shuffled = ''.join(letters)
+    return shuffled
+
+
+def legacy_shuffle_middle(middle, rng):
+    """
+    Return shuffled middle of the word, always different than given one.
+
+    Letters are sampled again until shuffled middle is different than original,
+    exactly like the first encoder version did.
+    """
+    shuffled = middle
+    while shuffled == middle:
+        shuffled = ''.join(rng.sample(middle, len(middle)))
+    return shuffled
 
 
-def weirdtext_encoder(original_text):
+@lru_cache(maxsize=1 << 16)
+def _local_shuffle(seed, middle):
+    return shuffle_middle(middle, random.Random(f"{seed}:{middle}"))
+
+
+def local_shuffle_middle(middle, rng):
+    """
+    Return shuffled middle of the word, always different than given one.
+
+    Generator is seeded with the middle itself (and seed of LocalRandom),
+    so the same middle is always shuffled the same, wherever it is in the text.
+    Results are memoized.
+    """
+    return _local_shuffle(rng.seed, middle)
+
+
+SHUFFLERS = {
+    SHUFFLE_BOUNDED: shuffle_middle,
+    SHUFFLE_LEGACY: legacy_shuffle_middle,
+    SHUFFLE_LOCAL: local_shuffle_middle,
+}
+
+
+def split_chunks(chunks):
+    """
+    Regroup stream of text chunks into pieces which never end in the middle
+    of a word, so every piece can be scanned separately.
+
+    Word at the end of the chunk can continue in the next one,
+    so it's kept back until it's complete.
+    """
+    pending = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        text = pending + chunk
+        # `\w` is alphanumeric character or underscore
+        end = len(text)
+        while end and (text[end - 1].isalnum() or text[end - 1] == "_"):
+            end -= 1
+        pending = text[end:]
+        if end:
+            yield text[:end]
+    if pending:
+        yield pending
+
+
+class ShardedRandom:
+    """
+    Random generator of the encoder which follows position in the text.
+
+    Text is divided into shards of `shard_size` characters. Words which start
+    in k-th shard are shuffled with `random.Random(seed)` for k=0 and with
+    `random.Random(f"{seed}:{k}")` for next shards, so every shard can be
+    encoded separately (e.g. in parallel) with the same result.
+    With `shard_size=None` one generator is used for the whole text.
+    """
+    def __init__(self, seed=ENCODER_SEED, shard_size=ENCODER_SHARD_SIZE, position=0):
+        self.seed = seed
+        self.shard_size = shard_size
+        self.position = position
+        self._rng = None
+        self._shard_end = -1
+
+    def at(self, position):
+        """Return random generator of the shard containing given position."""
+        if position >= self._shard_end:
+            if self.shard_size is None:
+                shard, self._shard_end = 0, float('inf')
+            else:
+                shard = position // self.shard_size
+                self._shard_end = (shard + 1) * self.shard_size
+            self._rng = random.Random(self.seed if shard == 0 else f"{self.seed}:{shard}")
+        return self._rng
+
+
+class LocalRandom:
+    """
+    Random state of `local` mode, the same for every position in the text
+    (`local_shuffle_middle` seeds own generator for every word).
+    """
+    def __init__(self, seed=ENCODER_SEED, position=0):
+        self.seed = seed
+        self.position = position
+
+    def at(self, position):  # pylint: disable=unused-argument
+        return self
+
+
+def _shuffle_text(text, rng, shuffle, shuffled_original_worlds):
+    """
+    Return text with shuffled every suitable word and append original words
+    to `shuffled_original_worlds`.
+    `rng` is ShardedRandom (or LocalRandom), its position is moved to the end of text.
+    """
+    pieces = []
+    last = 0
+    position = rng.position
+    for start, end, suitable in scan_words(text):
+        if suitable:
+            word = text[start:end]
+            pieces.append(text[last:start])
+            pieces.append(word[0] + shuffle(word[1:-1], rng.at(position + start)) + word[-1])
+            shuffled_original_worlds.append(word)
+            last = end
+    pieces.append(text[last:])
+    rng.position = position + len(text)
+    return "".join(pieces)
+
+
+def _sharded_random(seed, mode, shard_size, position=0):
+    """
+    Return ShardedRandom for the mode, legacy mode always uses one generator,
+    local mode uses LocalRandom.
+    """
+    if mode not in SHUFFLERS:
+        raise ValueError(f"Unknown shuffle mode: {mode}")
+    if mode == SHUFFLE_LOCAL:
+        return LocalRandom(seed, position)
+    if mode == SHUFFLE_LEGACY:
+        shard_size = None
+    return ShardedRandom(seed, shard_size, position)
+
+
+def split_shards(text, parts, shard_size=ENCODER_SHARD_SIZE):
+    """
+    Split text into at most `parts` slices made of whole shards.
+    Slice starts at the first shard boundary which is not in the middle of a word.
+
+    Returns list of (start, end) positions.
+    """
+    shards = max(1, -(-len(text) // shard_size))
+    shards_per_part = -(-shards // parts)
+    bounds = [0]
+    for shard in range(shards_per_part, shards, shards_per_part):
+        position = shard * shard_size
+        word = no_punctation_token.match(text, position - 1)
+        if word is not None:
+            position = word.end()
+        if bounds[-1] < position < len(text):
+            bounds.append(position)
+    bounds.append(len(text))
+    return list(zip(bounds, bounds[1:]))
+
+
+def _encode_slice(text, position, seed, mode, shard_size):
+    """Encode slice of the text which starts at `position` (without separators)."""
+    shuffled_original_worlds = []
+    rng = _sharded_random(seed, mode, shard_size, position)
+    with metrics.phase("encode.shuffle"):
+        encoded_text = _shuffle_text(text, rng, SHUFFLERS[mode], shuffled_original_worlds)
+    with metrics.phase("encode.sort"):
+        shuffled_original_worlds.sort(key=lambda s: s.lower())
+    return encoded_text, shuffled_original_worlds
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers):
+    """
+    Return process pool shared by parallel `weirdtext_encoder` calls, created
+    with `workers` processes on first use. Slices of concurrent calls wait
+    in its queue, so there are never more encoder processes than that.
+    Processes are started by fork server (where available), not forked
+    from the threaded web worker.
+    """
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            context = multiprocessing.get_context("forkserver")\
+                if "forkserver" in multiprocessing.get_all_start_methods() else None
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _executor
+
+
+def _discard_executor(executor):
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def weirdtext_encoder(original_text, seed=ENCODER_SEED, mode=SHUFFLE_BOUNDED,\
+    workers=1, shard_size=ENCODER_SHARD_SIZE):
     """
     Function shuffles the middle of every word in the original text.
 
-    * In while loop check if shuffled word is different than original
-    to ensure that every possible word is shuffled correctly.
-    * random.seed(30) is set to ensure that the text will always be encoded the same
-    because checks in `decoder` function require that.
+    * Shuffled word is always different than original to ensure that every
+    possible word is shuffled correctly. `mode` selects shuffle routine,
+    SHUFFLE_LEGACY reproduces output of the first encoder version.
+    * Every call creates its own random generators (see ShardedRandom) to ensure
+    that the text will always be encoded the same, because checks in `decoder`
+    function require that. Global `random` state is not touched,
+    so the function is thread-safe.
+    * With `workers` > 1 text is split into slices of whole shards which are
+    encoded in the shared process pool (see `get_executor`). Result is the same
+    as for one worker. Legacy mode is always encoded in one process.
 
     Returns shuffled text and sorted list of original words.
     """
-    random.seed(30)
-    words = re.split(no_punctation_token, original_text)
-    shuffled_original_worlds = []
-    for i, word in enumerate(words):
-        if word_suitable_for_shuffle(word):
-            middle_of_the_word = word[1:-1]
-            original_word = copy.copy(word)
-            while word == original_word:
-                random_middle = ''.join(random.sample(middle_of_the_word, len(middle_of_the_word)))
-                word = word[0] + random_middle + word[-1]
-            words[i] = word
-            shuffled_original_worlds.append(original_word)
-
-    encoded_text = SEPARATOR + "".join(words) + SEPARATOR
-    return encoded_text, sorted(shuffled_original_worlds, key=lambda s: s.lower())
+    metrics.observe("weirdtext_text_size_chars", len(original_text), operation="encode")
+    results = None
+    if mode != SHUFFLE_LEGACY and workers > 1 and len(original_text) > shard_size:
+        slices = split_shards(original_text, workers, shard_size)
+        executor = get_executor(workers)
+        try:
+            results = list(executor.map(_encode_slice,
+                (original_text[start:end] for start, end in slices),
+                (start for start, _ in slices),
+                repeat(seed), repeat(mode), repeat(shard_size),
+            ))
+        except BrokenProcessPool:
+            # e.g. worker process killed, next call creates new pool
+            _discard_executor(executor)
+    if results is None:
+        encoded_text, word_list = _encode_slice(original_text, 0, seed, mode, shard_size)
+        metrics.observe("weirdtext_shuffled_words", len(word_list), operation="encode")
+        return SEPARATOR + encoded_text + SEPARATOR, word_list
 
-def extract_encoded_text(encoded_text):
-    """Return text between two separators."""
-    return re.sub(SEPARATOR, '', encoded_text)
+    encoded_text = SEPARATOR + "".join(text for text, _ in results) + SEPARATOR
+    with metrics.phase("encode.merge"):
+        word_list = list(heapq.merge(*(words for _, words in results), key=lambda s: s.lower()))
+    metrics.observe("weirdtext_shuffled_words", len(word_list), operation="encode")
+    return encoded_text, word_list
 
-def weirdtext_decoder(encoded_text, word_list, original_text):
+
+def iter_encode(chunks, words=None, seed=ENCODER_SEED, mode=SHUFFLE_BOUNDED,\
+    shard_size=ENCODER_SHARD_SIZE):
     """
-    Function decodes given encoded_text based on given word_list.
+    Generator version of `weirdtext_encoder` for texts which don't fit in memory.
+
+    Consumes iterable of text chunks and yields encoded text piece by piece,
+    separators included, so joined pieces are equal to encoded text returned
+    by `weirdtext_encoder`. Original words are appended to `words` (any object
+    with `append`) in text order, sort them with `str.lower` key to get word_list.
     """
-    # Check encoded_text looks like composite output of encoder
-    if (encoded_text, word_list) != weirdtext_encoder(original_text):
+    rng = _sharded_random(seed, mode, shard_size)
+    if words is None:
+        words = []
+    shuffle = SHUFFLERS[mode]
+    yield SEPARATOR
+    for text in split_chunks(chunks):
+        yield _shuffle_text(text, rng, shuffle, words)
+    yield SEPARATOR
+
+
+def _word_start(text, position):
+    """Return start of the word which contains position (or position if it's between words)."""
+    while position > 0 and is_word_character(text[position - 1]):
+        position -= 1
+    return position
+
+
+def _word_end(text, position):
+    """Return end of the word which contains position (or position if it's between words)."""
+    while position < len(text) and is_word_character(text[position]):
+        position += 1
+    return position
+
+
+def _suitable_words(text):
+    return [text[start:end] for start, end, suitable in scan_words(text) if suitable]
+
+
+def _bisect_lower(word_list, key, right=False):
+    """`bisect` of word_list sorted with `str.lower` key."""
+    low, high = 0, len(word_list)
+    while low < high:
+        middle = (low + high) // 2
+        word_key = word_list[middle].lower()
+        if word_key < key or right and word_key == key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def weirdtext_reencode(original_text, encoded_text, word_list, edits, seed=ENCODER_SEED):
+    """
+    Apply edits to original text encoded in `local` mode and update its encoding,
+    re-encoding only words touched by the edits.
+
+    `edits` is list of (start, end, text) replacing `original_text[start:end]`
+    with text, sorted and not overlapping. In `local` mode shuffle of every word
+    depends only on the word, so the rest of encoded text is kept. Word list
+    is updated only for the words of the edited spans (words which differ only
+    in case are ordered by position like in encoder, so they are found again).
+    Result is the same as `weirdtext_encoder(new_original_text, mode=SHUFFLE_LOCAL)`
+    if the previous encoding was made in `local` mode.
+
+    Returns new original text, encoded text and word list.
+    """
+    text = extract_encoded_text(encoded_text)
+    if len(text) != len(original_text):
         raise ValueError("Incorrect encoded text.")
 
-    def _decode_with_map(word, word_list):
+    # edited spans extended to whole words: [start, end, edits]
+    spans = []
+    previous_end = 0
+    for start, end, new_text in edits:
+        if not previous_end <= start <= end <= len(original_text):
+            raise ValueError("Incorrect edits.")
+        previous_end = end
+        span_start, span_end = _word_start(original_text, start), _word_end(original_text, end)
+        if spans and span_start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], span_end)
+            spans[-1][2].append((start, end, new_text))
+        else:
+            spans.append([span_start, span_end, [(start, end, new_text)]])
+
+    rng = LocalRandom(seed)
+    original_pieces, encoded_pieces = [], []
+    removed, added = [], []
+    last = 0
+    for span_start, span_end, span_edits in spans:
+        pieces = []
+        position = span_start
+        for start, end, new_text in span_edits:
+            pieces.append(original_text[position:start])
+            pieces.append(new_text)
+            position = end
+        pieces.append(original_text[position:span_end])
+        new_span = "".join(pieces)
+
+        removed += _suitable_words(original_text[span_start:span_end])
+        original_pieces += [original_text[last:span_start], new_span]
+        encoded_pieces += [text[last:span_start],\
+            _shuffle_text(new_span, rng, local_shuffle_middle, added)]
+        last = span_end
+    original_pieces.append(original_text[last:])
+    encoded_pieces.append(text[last:])
+    new_original_text = "".join(original_pieces)
+
+    new_word_list = list(word_list)
+    removed, added = Counter(removed), Counter(added)
+    new_words = None
+    for key in sorted({word.lower() for word in removed + added}):
+        low = _bisect_lower(new_word_list, key)
+        high = _bisect_lower(new_word_list, key, right=True)
+        counts = Counter(new_word_list[low:high])
+        counts.subtract({word: count for word, count in removed.items() if word.lower() == key})
+        if any(count < 0 for count in counts.values()):
+            raise ValueError("Incorrect word list.")
+        counts.update({word: count for word, count in added.items() if word.lower() == key})
+        counts = +counts
+        if len(counts) > 1:
+            # order of different spellings depends on their positions in the text
+            if new_words is None:
+                new_words = defaultdict(list)
+                for word in _suitable_words(new_original_text):
+                    new_words[word.lower()].append(word)
+            block = new_words[key]
+        else:
+            block = list(counts.elements())
+        new_word_list[low:high] = block
+
+    return new_original_text, SEPARATOR + "".join(encoded_pieces) + SEPARATOR, new_word_list
+
+
+def word_runs(word_list):
+    """
+    Return run-length encoded word list, `[[word, count], ...]`.
+    Word list is sorted, so it's a list of unique words with counts
+    (a word is repeated only if other spelling of it is between).
+    """
+    return [[word, sum(1 for _ in group)] for word, group in groupby(word_list)]
+
+
+def expand_word_runs(runs):
+    """Return word list of run-length encoded `[[word, count], ...]`."""
+    return list(chain.from_iterable(repeat(word, count) for word, count in runs))
+
+
+class WordIndex:
+    """
+    Multiset index of the word_list used by the decoder.
+
+    Words are grouped by (length, first letter, last letter) and inside a group
+    by the sorted letters of the middle. Every group keeps counts of distinct
+    words, so matching an encoded word is a couple of dict lookups instead of
+    a scan over the whole list.
+    """
+    def __init__(self, word_list):
+        self._buckets = defaultdict(dict)
+        self._counts = defaultdict(Counter)
+        for word in word_list:
+            if not word:
+                continue
+            edges = (len(word), word[0], word[-1])
+            middle = ''.join(sorted(word[1:-1]))
+            self._buckets[edges].setdefault(middle, deque()).append(word)
+            self._counts[edges][word] += 1
+
+    def pop_match(self, word):
         """
-        Auxliary function for decode word with mapping on given word_list.
-        Funtion iterate through given original word_list and try to map
-        encoded word on the original one based on conditions.
+        Map encoded word on the original one and remove it from the index.
 
         Base conditions to map two words (must always occur):
             - the same letters on the edges,
@@ -76,29 +499,311 @@ def weirdtext_decoder(encoded_text, word_list, original_text):
             doesn't have the same letters one the edges
         Case 2:
             - middle of two words contains the same letters
-        Any other cases return False
+        Any other cases return False. Ties are resolved in word_list order.
         """
-        for possible_word in word_list:
-            # if first and last letter in word are equal
-            # but not in the rest of the words with the same length
-            if word[0] == possible_word[0] and word[-1] == possible_word[-1]\
-                and len(word) == len(possible_word):
-                if not any((word[0] == w[0] and word[-1] == w[-1])\
-                    for w in word_list if w != possible_word and len(word) == len(w)):
-                    return possible_word, True
-                # compare middle of the word contains the same letters
-                middle_word, middle_possible_word = word[1:-1], possible_word[1:-1]
-                if sorted(middle_word) == sorted(middle_possible_word):
-                    return possible_word, True
-        return "", False
-
-    encoded_text = extract_encoded_text(encoded_text)
-    encoded_words = re.split(no_punctation_token, encoded_text)
-    for i, e_word in enumerate(encoded_words):
-        if word_suitable_for_shuffle(e_word):
-            possible_encoded_word, _found = _decode_with_map(e_word, word_list)
+        edges = (len(word), word[0], word[-1])
+        counts = self._counts.get(edges)
+        if not counts:
+            return "", False
+        if len(counts) == 1:
+            possible_word = next(iter(counts))
+            middle = ''.join(sorted(possible_word[1:-1]))
+        else:
+            middle = ''.join(sorted(word[1:-1]))
+            if not self._buckets[edges].get(middle):
+                return "", False
+            possible_word = self._buckets[edges][middle][0]
+
+        self._buckets[edges][middle].popleft()
+        counts[possible_word] -= 1
+        if not counts[possible_word]:
+            del counts[possible_word]
+        return possible_word, True
+
+def extract_encoded_text(encoded_text):
+    """Return text between two separators."""
+    return re.sub(SEPARATOR, '', encoded_text)
+
+def iter_extract_encoded_text(chunks):
+    """
+    Generator version of `extract_encoded_text`, removes separators
+    from stream of encoded text chunks, also ones split between chunks.
+    """
+    pending = ""
+    for chunk in chunks:
+        text = pending + chunk
+        pieces = text.split(SEPARATOR)
+        # the end of text can be beginning of the separator
+        tail = pieces[-1]
+        keep = len(SEPARATOR) - 1
+        pieces[-1], pending = tail[:-keep], tail[-keep:]
+        yield "".join(pieces)
+    yield pending
+
+def weirdtext_digest(encoded_text, word_list, original_text, key):
+    """
+    Return keyed hash (HMAC-SHA256) of the encoder output and its original text.
+
+    Every part is prefixed with its length so different splits of the same
+    characters never produce the same digest.
+    """
+    mac = hmac.new(key, digestmod=hashlib.sha256)
+    mac.update(len(word_list).to_bytes(8, 'big'))
+    for part in (original_text, encoded_text, *word_list):
+        if not isinstance(part, str):
+            raise ValueError("Incorrect encoded text.")
+        data = part.encode('utf-8', 'surrogatepass')
+        mac.update(len(data).to_bytes(8, 'big'))
+        mac.update(data)
+    return mac.hexdigest()
+
+class _RemainingPositions:
+    """
+    Positions 0..size-1 in a Fenwick tree, a position is removed and its rank
+    among remaining positions found (or the other way round) in O(log size).
+    """
+    def __init__(self, size):
+        self.size = size
+        self.tree = [i & -i for i in range(size + 1)]
+
+    def take(self, position):
+        """Remove the position, return number of remaining positions before it."""
+        rank = 0
+        i = position
+        while i > 0:
+            rank += self.tree[i]
+            i -= i & -i
+        i = position + 1
+        while i <= self.size:
+            self.tree[i] -= 1
+            i += i & -i
+        return rank
+
+    def take_nth(self, rank):
+        """Remove the remaining position with given rank, return it."""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            if position + step <= self.size and self.tree[position + step] <= rank:
+                position += step
+                rank -= self.tree[position]
+            step >>= 1
+        self.take(position)
+        return position
+
+
+def permutation_digits(original_middle, shuffled_middle):
+    """
+    Return digits of Lehmer code of the permutation which restores original middle
+    of the word from the shuffled one, `original[i] == shuffled[p[i]]`; digit i is
+    smaller than `len(middle) - i`. Repeated letters are taken in order, so digits
+    are as small as possible.
+    """
+    if len(original_middle) != len(shuffled_middle):
+        raise ValueError("Incorrect encoded text.")
+    positions = defaultdict(deque)
+    for i, letter in enumerate(shuffled_middle):
+        positions[letter].append(i)
+    remaining = _RemainingPositions(len(shuffled_middle))
+    digits = []
+    for letter in original_middle:
+        if not positions[letter]:
+            raise ValueError("Incorrect encoded text.")
+        digits.append(remaining.take(positions[letter].popleft()))
+    return digits
+
+
+def apply_permutation_digits(shuffled_middle, digits):
+    """Return original middle of the word restored with `permutation_digits`."""
+    remaining = _RemainingPositions(len(shuffled_middle))
+    return ''.join(shuffled_middle[remaining.take_nth(digit)] for digit in digits)
+
+
+def _pack_varint(number):
+    """Return unsigned LEB128 bytes of the number."""
+    data = bytearray()
+    while number > 0x7f:
+        data.append(number & 0x7f | 0x80)
+        number >>= 7
+    data.append(number)
+    return data
+
+
+def _read_varint(data, offset, bound):
+    """
+    Return unsigned LEB128 number at the offset of data and offset after it.
+    The number must be smaller than `bound` and in the shortest form, so it takes
+    at most as many bytes as `bound - 1` needs.
+    """
+    number = 0
+    for index in range(max(1, -(-(bound - 1).bit_length() // 7))):
+        if offset >= len(data):
+            break
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7f) << 7 * index
+        if not byte & 0x80:
+            if number >= bound or index and not byte:
+                break
+            return number, offset
+    raise ValueError("Incorrect hints.")
+
+
+def weirdtext_hints(original_text, encoded_text):
+    """
+    Return permutation hints of the encoded text: base64 of varint packed
+    `permutation_digits` of every shuffled word in text order. The last digit
+    of a word is always 0, so it's left out.
+
+    With hints encoded text is decoded by `weirdtext_hint_decoder` in one pass,
+    without word_list and original_text. Shuffled words have the same spans
+    in both texts, because only middles of the words are shuffled.
+    """
+    text = extract_encoded_text(encoded_text)
+    if len(text) != len(original_text):
+        raise ValueError("Incorrect encoded text.")
+    data = bytearray()
+    for start, end, suitable in scan_words(original_text):
+        if suitable:
+            digits = permutation_digits(original_text[start + 1:end - 1],\
+                text[start + 1:end - 1])
+            for digit in digits[:-1]:
+                data += _pack_varint(digit)
+    return base64.b64encode(data).decode('ascii')
+
+
+def weirdtext_hints_digest(encoded_text, hints, key):
+    """Return keyed hash (HMAC-SHA256) of the encoder output with hints."""
+    mac = hmac.new(key, b"hints", digestmod=hashlib.sha256)
+    for part in (encoded_text, hints):
+        data = part.encode('utf-8', 'surrogatepass')
+        mac.update(len(data).to_bytes(8, 'big'))
+        mac.update(data)
+    return mac.hexdigest()
+
+
+def weirdtext_hint_decoder(encoded_text, hints, digest=None, key=None):
+    """
+    Function decodes given encoded_text based on permutation hints
+    (see `weirdtext_hints`), in O(n log n) of the longest word.
+
+    When `digest` (made by `weirdtext_hints_digest` with the same `key`) is given
+    the input is checked, otherwise it must come from trusted source.
+    """
+    metrics.observe("weirdtext_text_size_chars", len(encoded_text), operation="decode")
+    if digest is not None and not hmac.compare_digest(digest.encode(),\
+        weirdtext_hints_digest(encoded_text, hints, key).encode()):
+        raise ValueError("Incorrect encoded text.")
+    try:
+        data = base64.b64decode(hints, validate=True)
+    except binascii.Error as exc:
+        raise ValueError("Incorrect hints.") from exc
+
+    with metrics.phase("decode.hints"):
+        text = extract_encoded_text(encoded_text)
+        pieces = []
+        last = offset = 0
+        for start, end, suitable in scan_words(text):
+            if suitable:
+                middle = text[start + 1:end - 1]
+                digits = []
+                for bound in range(len(middle), 1, -1):
+                    digit, offset = _read_varint(data, offset, bound)
+                    digits.append(digit)
+                digits.append(0)
+                pieces.append(text[last:start + 1])
+                pieces.append(apply_permutation_digits(middle, digits))
+                last = end - 1
+        if offset != len(data):
+            raise ValueError("Incorrect hints.")
+        pieces.append(text[last:])
+    return "".join(pieces)
+
+def weirdtext_decoder(encoded_text, word_list, original_text, digest=None, key=None,\
+    encoder=None, mode=None):
+    """
+    Function decodes given encoded_text based on given word_list.
+
+    When `digest` (made by `weirdtext_digest` with the same `key`) is given
+    it is enough to check the input, otherwise original_text is encoded again
+    in shuffle `mode` (bounded, then legacy when it's not given) with `encoder`
+    (`weirdtext_encoder` by default, e.g. cached version can be given)
+    and compared with the input.
+    """
+    metrics.observe("weirdtext_text_size_chars", len(encoded_text), operation="decode")
+    metrics.observe("weirdtext_shuffled_words", len(word_list), operation="decode")
+    # Check encoded_text looks like composite output of encoder
+    if digest is not None:
+        with metrics.phase("decode.verify_digest"):
+            expected = weirdtext_digest(encoded_text, word_list, original_text, key)
+        if not hmac.compare_digest(digest.encode(), expected.encode()):
+            raise ValueError("Incorrect encoded text.")
+    else:
+        with metrics.phase("decode.verify_encode"):
+            encoder = encoder or weirdtext_encoder
+            if all((encoded_text, word_list) != encoder(original_text, mode=encoder_mode)\
+                for encoder_mode in ((mode,) if mode is not None else DECODER_FALLBACK_MODES)):
+                raise ValueError("Incorrect encoded text.")
+
+    with metrics.phase("decode.index"):
+        word_index = WordIndex(word_list)
+    with metrics.phase("decode.match"):
+        return _decode_text(extract_encoded_text(encoded_text), word_index)
+
+def _decode_text(text, word_index):
+    """Return text with every encoded word replaced with its original word."""
+    pieces = []
+    last = 0
+    for start, end, suitable in scan_words(text):
+        if suitable:
+            possible_encoded_word, _found = word_index.pop_match(text[start:end])
             if _found:
-                encoded_words[i] = possible_encoded_word
-                word_list.remove(encoded_words[i])
-    decoded_text = "".join(encoded_words)
-    return decoded_text
+                pieces.append(text[last:start])
+                pieces.append(possible_encoded_word)
+                last = end
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+def iter_decode(chunks, word_list):
+    """
+    Generator version of decoder for encoded texts which don't fit in memory.
+
+    Consumes iterable of encoded text chunks (separators included) and yields
+    decoded text piece by piece. Input is not checked against original text,
+    so it must come from trusted source (e.g. archive made by the encoder).
+    """
+    word_index = WordIndex(word_list)
+    for text in split_chunks(iter_extract_encoded_text(chunks)):
+        yield _decode_text(text, word_index)
+
+
+def weirdtext_encode_batch(items, encoder=None):
+    """
+    Encode many texts in one call.
+    `items` is iterable of (original_text, mode) pairs, every one is encoded
+    with `encoder` (`weirdtext_encoder` by default, e.g. cached encoder).
+
+    Returns list of (encoded_text, word_list) in the order of items.
+    """
+    encoder = encoder or weirdtext_encoder
+    return [encoder(original_text, mode=mode) for original_text, mode in items]
+
+def weirdtext_decode_batch(items, key=None, decoder=None):
+    """
+    Decode many texts in one call.
+    `items` is iterable of (encoded_text, word_list, original_text, digest, mode) tuples,
+    mode can be None (see `weirdtext_decoder`), every one is decoded with `decoder`
+    (`weirdtext_decoder` by default, e.g. cached decoder).
+
+    Returns list of decoded texts in the order of items, None for every item
+    which is not correct composite output of encoder.
+    """
+    decoder = decoder or weirdtext_decoder
+    decoded_texts = []
+    for encoded_text, word_list, original_text, digest, mode in items:
+        try:
+            decoded_texts.append(decoder(encoded_text, word_list, original_text,\
+                digest=digest, key=key, mode=mode))
+        except ValueError:
+            decoded_texts.append(None)
+    return decoded_texts
@@ -0,0 +1,160 @@
+"""
+Fast path variants of encode/decode views, without DRF.
+
+Bodies are parsed with `orjson` (optional, `json` is used when it isn't installed)
+and validated by validators compiled once from request body schemas of the API
+documentation (swagger/swagger.py). Responses are raw JSON bytes. The views are
+called by FastPathMiddleware right after compression middleware, so sessions,
+authentication, CSRF, messages and security headers middleware are skipped.
+Status codes are the same as of DRF views (422 missing data, 400 incorrect data),
+JSON is the only wire format and responses have no ETags.
+"""
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from drf_yasg.openapi import TYPE_ARRAY, TYPE_BOOLEAN, TYPE_INTEGER, TYPE_OBJECT, TYPE_STRING
+from rest_framework import status
+
+from swagger.swagger import enccode_request_body, decode_request_body
+
+from . import metrics
+from .admission import encode_cost, Rejected
+from .async_views import rejected_response
+from .views import encode_result, decode_result, request_decode_cost, valid_word_runs,\
+    coalesced, encode_flight_key, decode_flight_key, SHUFFLE_BOUNDED
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    loads = orjson.loads
+    dumps = orjson.dumps
+else:
+    loads = json.loads
+
+    def dumps(data):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+PYTHON_TYPES = {
+    TYPE_STRING: (str,),
+    TYPE_BOOLEAN: (bool,),
+    TYPE_INTEGER: (int,),
+    TYPE_ARRAY: (list,),
+    TYPE_OBJECT: (dict,),
+}
+
+
+def compile_property(schema):
+    """
+    Return function checking if value matches property schema: type, enum and
+    type of array items (one level, nested items are checked by `check` of compile_schema).
+    """
+    types = PYTHON_TYPES[schema.type]
+    enum = frozenset(schema['enum']) if 'enum' in schema else None
+    item_types = PYTHON_TYPES[schema['items'].type] if 'items' in schema else None
+
+    def check(value):
+        # bool is int, but not JSON integer
+        if not isinstance(value, types) or isinstance(value, bool) and bool not in types:
+            return False
+        if enum is not None and value not in enum:
+            return False
+        return item_types is None or all(isinstance(item, item_types) for item in value)
+    return check
+
+
+def compile_schema(schema, complete=None, check=None):
+    """
+    Return validator of request body described by object schema, it returns error
+    status like `validate_encode_data`: 422 when a required property is missing
+    (or `complete(data)` is false), 400 when a property has incorrect type or value
+    (or `check(data)` is false), None for correct data.
+    """
+    required = tuple(schema.get('required', ()))
+    checks = tuple((name, compile_property(property_schema))\
+        for name, property_schema in schema['properties'].items())
+
+    def validate(data):
+        if any(name not in data for name in required)\
+            or complete is not None and not complete(data):
+            return status.HTTP_422_UNPROCESSABLE_ENTITY
+        for name, check_property in checks:
+            if name in data and not check_property(data[name]):
+                return status.HTTP_400_BAD_REQUEST
+        if check is not None and not check(data):
+            return status.HTTP_400_BAD_REQUEST
+        return None
+    return validate
+
+
+validate_encode_body = compile_schema(enccode_request_body)
+
+validate_decode_body = compile_schema(
+    decode_request_body,
+    complete=lambda data: "digest" in data if "hints" in data\
+        else "original_text" in data and ("word_list" in data or "word_runs" in data),
+    check=lambda data: "hints" in data or "word_list" in data\
+        or valid_word_runs(data['word_runs']),
+)
+
+
+def parse_body(request):
+    """Return parsed JSON object of request body, None if body isn't JSON object."""
+    with metrics.phase("request.parse"):
+        try:
+            data = loads(request.body)
+        except ValueError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status_code, content_type="application/json")
+
+
+def encode_view(request):
+    """Fast path version of `POST /v1/encode/`, see EncodeApi."""
+    if request.method != "POST":
+        return HttpResponse(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    data = parse_body(request)
+    error_status = status.HTTP_400_BAD_REQUEST if data is None else validate_encode_body(data)
+    if error_status is not None:
+        return HttpResponse(status=error_status)
+
+    workers = settings.WEIRDTEXT_ENCODER_WORKERS if data.get('parallel') else 1
+    original_text, mode = data['original_text'], data.get('mode', SHUFFLE_BOUNDED)
+    options = (data.get('word_runs', False), data.get('hints', False), data.get('store', False))
+    try:
+        return json_response(coalesced(encode_flight_key(original_text, mode, *options),\
+            encode_cost(original_text, options[1]), encode_result, original_text, mode, workers,\
+            *options))
+    except Rejected as exc:
+        return rejected_response(exc)
+
+
+def decode_view(request):
+    """Fast path version of `POST /v1/decode/`, see DecodeApi."""
+    if request.method != "POST":
+        return HttpResponse(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    data = parse_body(request)
+    error_status = status.HTTP_400_BAD_REQUEST if data is None else validate_decode_body(data)
+    if error_status is not None:
+        return HttpResponse(status=error_status)
+
+    try:
+        return json_response(coalesced(decode_flight_key(data), request_decode_cost(data),\
+            decode_result, data))
+    except Rejected as exc:
+        return rejected_response(exc)
+    except ValueError:
+        return json_response("Incorrect encoded text", status.HTTP_400_BAD_REQUEST)
+
+
+# stateless JSON API, the same as DRF APIView; FastPathMiddleware calls them directly
+encode_view.csrf_exempt = decode_view.csrf_exempt = True
+encode_view.fast_path = decode_view.fast_path = True
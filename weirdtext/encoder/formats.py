@@ -0,0 +1,73 @@
+"""
+Compact binary wire formats of the API, negotiated by Content-Type and Accept headers.
+
+MessagePack (`msgpack` package) and CBOR (`cbor2` package) are optional,
+their parsers and renderers are enabled only when the package is installed.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError("MessagePack parse error - %s" % exc) from exc
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, use_bin_type=True)
+
+
+class CBORParser(BaseParser):
+    media_type = "application/cbor"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except Exception as exc:
+            raise ParseError("CBOR parse error - %s" % exc) from exc
+
+
+class CBORRenderer(BaseRenderer):
+    media_type = "application/cbor"
+    format = "cbor"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return cbor2.dumps(data)
+
+
+API_PARSER_CLASSES = list(api_settings.DEFAULT_PARSER_CLASSES)\
+    + ([MessagePackParser] if msgpack is not None else [])\
+    + ([CBORParser] if cbor2 is not None else [])
+
+API_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES)\
+    + ([MessagePackRenderer] if msgpack is not None else [])\
+    + ([CBORRenderer] if cbor2 is not None else [])
@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encoder.benchmark import run_benchmarks, find_regressions, benchmark_overhead
+
+
+class Command(BaseCommand):
+    """
+    Benchmark encoder, decoder and API views on synthetic texts.
+    Example:
+        python manage.py weirdtext_benchmark --save-baseline baseline.json
+        python manage.py weirdtext_benchmark --baseline baseline.json --threshold 0.2
+        python manage.py weirdtext_benchmark --overhead --repeat 1000
+    """
+    help = "Benchmark encoder, decoder and API views and compare results with baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default="100,1000,10000",\
+            help="comma separated numbers of words in generated texts")
+        parser.add_argument('--distributions', default="latin,repeated,unicode,punctuation",\
+            help="comma separated distributions of generated texts")
+        parser.add_argument('--targets', default="",\
+            help="comma separated targets (encoder, decoder, encode_view, decode_view), "\
+                "all by default")
+        parser.add_argument('--repeat', type=int, default=10,\
+            help="number of measured calls of every target")
+        parser.add_argument('--baseline', help="JSON file with results to compare with")
+        parser.add_argument('--threshold', type=float, default=0.2,\
+            help="allowed slowdown against baseline (fraction)")
+        parser.add_argument('--save-baseline', help="write results as JSON to given file")
+        parser.add_argument('--overhead', action='store_true',\
+            help="only compare per-request overhead of DRF views and fast path views")
+
+    def handle(self, *args, **options):
+        if options['overhead']:
+            self.write_overhead(options['repeat'])
+            return
+
+        results = run_benchmarks(
+            [int(size) for size in options['sizes'].split(",")],
+            options['distributions'].split(","),
+            options['repeat'],
+            [target for target in options['targets'].split(",") if target],
+        )
+
+        self.stdout.write(f"{'case':<40}{'p50 ms':>12}{'p99 ms':>12}{'Mchar/s':>10}"\
+            f"{'peak KiB':>12}")
+        for case, measurements in results.items():
+            self.stdout.write(f"{case:<40}{measurements['p50'] * 1000:>12.3f}"\
+                f"{measurements['p99'] * 1000:>12.3f}{measurements['throughput'] / 1e6:>10.2f}"\
+                f"{measurements['peak_memory'] / 1024:>12.1f}")
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as baseline_file:
+                json.dump(results, baseline_file, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline_file:
+                regressions = find_regressions(results, json.load(baseline_file),\
+                    options['threshold'])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def write_overhead(self, repeat):
+        self.stdout.write(f"{'endpoint':<12}{'DRF p50 us':>14}{'fast p50 us':>14}"\
+            f"{'saved us':>12}{'saved':>8}")
+        for name, variants in benchmark_overhead(repeat).items():
+            drf, fast = variants['drf']['p50'], variants['fast']['p50']
+            self.stdout.write(f"{name:<12}{drf * 1e6:>14.1f}{fast * 1e6:>14.1f}"\
+                f"{(drf - fast) * 1e6:>12.1f}{(drf - fast) / drf:>8.0%}")
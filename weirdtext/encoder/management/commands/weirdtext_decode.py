@@ -0,0 +1,57 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from encoder.bulk import decode_record
+from encoder.views import validate_decode_data
+
+from .weirdtext_encode import add_jsonl_arguments, run_jsonl
+
+
+class Command(BaseCommand):
+    """
+    Decode JSON file with the same data as `/v1/decode/` request body and write decoded text.
+    With `--jsonl` every line of the input is `/v1/decode/` request body
+    and every line of the output is the response (or `{"error": status}`).
+    Example:
+        python manage.py weirdtext_decode book.json -o book.txt
+        python manage.py weirdtext_decode --jsonl encoded.jsonl --workers 4 -o decoded.jsonl
+    """
+    help = "Decode JSON file (or standard input) with encoded text and write decoded text."
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',\
+            help="JSON file to decode, `-` for standard input")
+        parser.add_argument('-o', '--output', default='-',\
+            help="file for the result, `-` for standard output")
+        parser.add_argument('--workers', type=int, default=settings.WEIRDTEXT_ENCODER_WORKERS,\
+            help="number of processes decoding records in parallel with --jsonl")
+        add_jsonl_arguments(parser)
+
+    def handle(self, *args, **options):
+        if options['jsonl']:
+            run_jsonl(self, options, decode_record, validate_decode_data)
+            return
+
+        try:
+            if options['input'] == '-':
+                data = json.load(sys.stdin)
+            else:
+                with open(options['input'], encoding='utf-8') as input_file:
+                    data = json.load(input_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Can't read {options['input']}: {exc}") from exc
+        if not isinstance(data, dict) or validate_decode_data(data) is not None:
+            raise CommandError("Input is not correct `/v1/decode/` request body.")
+
+        result = decode_record(data, settings.WEIRDTEXT_DIGEST_KEY)
+        if "error" in result:
+            raise CommandError("Incorrect encoded text.")
+
+        if options['output'] == '-':
+            self.stdout.write(result['decoded_text'], ending="")
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                output_file.write(result['decoded_text'])
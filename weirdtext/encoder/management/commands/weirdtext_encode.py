@@ -0,0 +1,134 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from encoder.archive import encode_file
+from encoder.bulk import Progress, encode_record, process_jsonl
+from encoder.encoder import weirdtext_encoder, weirdtext_digest, SHUFFLE_BOUNDED, SHUFFLE_MODES
+from encoder.views import validate_encode_data
+
+
+class Command(BaseCommand):
+    """
+    Encode text file and write JSON with the same data as `/v1/encode/` response.
+    With `--jsonl` every line of the input is `/v1/encode/` request body
+    and every line of the output is the response (or `{"error": status}`);
+    records with `store` or `parallel` are rejected with 400.
+    With `--mmap` huge file is encoded from memory map without reading it into memory,
+    word list over `--memory-budget` is sorted on disk, digest is not computed.
+    Example:
+        python manage.py weirdtext_encode book.txt --workers 4 -o book.json
+        python manage.py weirdtext_encode --jsonl dump.jsonl -o encoded.jsonl
+        python manage.py weirdtext_encode --mmap archive.txt -o archive.json
+    """
+    help = "Encode text file (or standard input) and write JSON with encoded text and word list."
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',\
+            help="text file to encode, `-` for standard input")
+        parser.add_argument('-o', '--output', default='-',\
+            help="JSON file for the result, `-` for standard output")
+        parser.add_argument('--mode', choices=SHUFFLE_MODES, default=SHUFFLE_BOUNDED,\
+            help="shuffle mode (default of records without mode with --jsonl)")
+        parser.add_argument('--workers', type=int, default=settings.WEIRDTEXT_ENCODER_WORKERS,\
+            help="number of processes encoding large text (or records) in parallel")
+        add_jsonl_arguments(parser)
+        parser.add_argument('--mmap', action='store_true',\
+            help="encode huge file from memory map, with word list sorted on disk")
+        parser.add_argument('--memory-budget', type=int, default=256 * 1024 * 1024,\
+            help="bytes of word list kept in memory with --mmap")
+        parser.add_argument('--block-size', type=int, default=1024 * 1024,\
+            help="bytes of the file decoded at once with --mmap")
+
+    def handle(self, *args, **options):
+        if options['jsonl']:
+            run_jsonl(self, options, encode_record, validate_encode_record,\
+                defaults={"mode": options['mode']})
+            return
+        if options['mmap']:
+            self.encode_mmap(options)
+            return
+
+        try:
+            if options['input'] == '-':
+                original_text = sys.stdin.read()
+            else:
+                with open(options['input'], encoding='utf-8') as input_file:
+                    original_text = input_file.read()
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Can't read {options['input']}: {exc}") from exc
+
+        encoded_text, word_list = weirdtext_encoder(original_text, mode=options['mode'],\
+            workers=options['workers'])
+        result = json.dumps({
+            "encoded_text": encoded_text,
+            "word_list": word_list,
+            "digest": weirdtext_digest(encoded_text, word_list, original_text,\
+                settings.WEIRDTEXT_DIGEST_KEY),
+        }, ensure_ascii=False)
+
+        if options['output'] == '-':
+            self.stdout.write(result)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                output_file.write(result)
+
+    def encode_mmap(self, options):
+        if options['input'] == '-':
+            raise CommandError("--mmap requires input file.")
+        if options['output'] == '-':
+            self.stdout.ending = None
+            output_file = self.stdout
+        else:
+            output_file = open(options['output'], 'w', encoding='utf-8',\
+                buffering=options['block_size'])
+        try:
+            encode_file(options['input'], output_file, mode=options['mode'],\
+                block_size=options['block_size'], memory_budget=options['memory_budget'])
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Can't encode {options['input']}: {exc}") from exc
+        finally:
+            if output_file is not self.stdout:
+                output_file.close()
+
+
+def validate_encode_record(data):
+    """
+    Return error status of JSONL encode record like `validate_encode_data`,
+    records aren't saved and `--workers` replaces `parallel`, so both are 400.
+    """
+    error_status = validate_encode_data(data)
+    if error_status is None and (data.get('store', False) or data.get('parallel', False)):
+        return 400
+    return error_status
+
+
+def add_jsonl_arguments(parser):
+    parser.add_argument('--jsonl', action='store_true',\
+        help="input and output are JSONL files with one request and response per line")
+    parser.add_argument('--window', type=int, default=None,\
+        help="maximum number of records in flight with --jsonl (4 * workers by default)")
+    parser.add_argument('--progress', type=float, default=5,\
+        help="seconds between progress reports on standard error with --jsonl, 0 disables them")
+
+
+def run_jsonl(command, options, function, validate, defaults=None):
+    """Process JSONL input of the command with `process_jsonl`, report progress to stderr."""
+    try:
+        input_file = sys.stdin.buffer if options['input'] == '-' else open(options['input'], 'rb')
+        output_file = command.stdout if options['output'] == '-'\
+            else open(options['output'], 'w', encoding='utf-8')
+    except OSError as exc:
+        raise CommandError(f"Can't open file: {exc}") from exc
+
+    try:
+        process_jsonl(input_file, output_file, function, validate, settings.WEIRDTEXT_DIGEST_KEY,\
+            workers=max(1, options['workers']), window=options['window'],\
+            progress=Progress(command.stderr.write, options['progress']), defaults=defaults)
+    finally:
+        if input_file is not sys.stdin.buffer:
+            input_file.close()
+        if output_file is not command.stdout:
+            output_file.close()
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from encoder.profiler import load_profiles, summarize
+
+
+class Command(BaseCommand):
+    """
+    Summarize request profiles saved by ProfilerMiddleware.
+    Example:
+        python manage.py weirdtext_profiles --top 10
+    """
+    help = "Summarize saved request profiles: endpoints, slowest requests and hot functions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=settings.WEIRDTEXT_PROFILER['DIRECTORY'],\
+            help="directory with saved profiles")
+        parser.add_argument('--top', type=int, default=10,\
+            help="number of slowest requests and functions to show")
+
+    def handle(self, *args, **options):
+        summary = summarize(load_profiles(options['directory']), options['top'])
+        self.stdout.write(f"Profiles: {summary['profiles']}")
+        for endpoint, count in sorted(summary['endpoints'].items()):
+            self.stdout.write(f"  {endpoint}: {count}")
+
+        self.stdout.write("\nSlowest requests:")
+        for profile in summary['slowest']:
+            self.stdout.write(f"  {profile['duration'] * 1000:10.1f} ms"\
+                f"{profile['content_length']:>12} B  {profile['method']} {profile['path']}"\
+                f"  {profile['file']}")
+
+        self.stdout.write("\nFunctions by total cumulative time:")
+        for function, stats in summary['functions']:
+            self.stdout.write(f"  {stats['cumtime'] * 1000:10.1f} ms{stats['calls']:>10} calls"\
+                f"{stats['profiles']:>6} profiles  {function}")
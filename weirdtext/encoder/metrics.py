@@ -0,0 +1,111 @@
+"""
+Minimal metrics registry exposed in Prometheus text format.
+
+Metrics are collected only when ENABLED is True (WEIRDTEXT_METRICS_ENABLED
+setting), otherwise `phase` returns shared no-op context manager and
+`observe` returns immediately.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+
+ENABLED = False
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,\
+    2.5, 5, 10, 30)
+SIZE_BUCKETS = tuple(10 ** exponent for exponent in range(1, 10))
+
+
+class Histogram:
+    """Histogram with cumulative buckets for every combination of labels."""
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self._sums = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[key][bucket] += 1
+            self._sums[key] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                labels = "".join(f'{name}="{value}",' for name, value in key)
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+                labels = "{" + labels.rstrip(",") + "}" if labels else ""
+                lines.append(f"{self.name}_sum{labels} {self._sums[key]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+
+HISTOGRAMS = {histogram.name: histogram for histogram in (
+    Histogram("weirdtext_request_duration_seconds", "Request latency per endpoint.",\
+        LATENCY_BUCKETS),
+    Histogram("weirdtext_request_size_bytes", "Request body size per endpoint.", SIZE_BUCKETS),
+    Histogram("weirdtext_phase_duration_seconds", "Duration of encoder and decoder phases.",\
+        LATENCY_BUCKETS),
+    Histogram("weirdtext_text_size_chars", "Size of encoded and decoded texts.", SIZE_BUCKETS),
+    Histogram("weirdtext_shuffled_words", "Number of shuffled words per text.", SIZE_BUCKETS),
+)}
+
+
+def observe(name, value, **labels):
+    """Record value in the histogram, if metrics are enabled."""
+    if ENABLED:
+        HISTOGRAMS[name].observe(value, **labels)
+
+
+class _Phase:
+    """Context manager recording its duration as `weirdtext_phase_duration_seconds`."""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        HISTOGRAMS["weirdtext_phase_duration_seconds"].observe(\
+            time.perf_counter() - self.start, phase=self.name)
+
+
+_NO_PHASE = nullcontext()
+
+
+def phase(name):
+    """Return context manager timing the phase, no-op if metrics are disabled."""
+    return _Phase(name) if ENABLED else _NO_PHASE
+
+
+def render():
+    """Return all metrics in Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for histogram in HISTOGRAMS.values():
+        histogram.reset()
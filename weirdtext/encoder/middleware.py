@@ -0,0 +1,271 @@
+import cProfile
+import io
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+
+from . import metrics
+from .compression import CONTENT_CODINGS, DECOMPRESSION_ERRORS, choose_coding, compress,\
+    compress_sequence, decompress, decompressing_reader
+from .profiler import run_profiled, save_profile
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base of middleware working both in WSGI and ASGI (without switching
+    async views to threads). Subclasses implement `__call__` for sync mode
+    and `__acall__` for async mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Record latency and body size of every request per endpoint (URL route),
+    when metrics are enabled (WEIRDTEXT_METRICS_ENABLED setting).
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not metrics.ENABLED:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.ENABLED:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, start)
+        return response
+
+    @staticmethod
+    def record(request, response, start):
+        resolver_match = getattr(request, 'resolver_match', None)
+        # route, not path, to keep number of label values small
+        endpoint = resolver_match.route if resolver_match else "unmatched"
+        labels = {"endpoint": endpoint, "method": request.method}
+        metrics.observe("weirdtext_request_duration_seconds", time.perf_counter() - start,\
+            status=response.status_code, **labels)
+        metrics.observe("weirdtext_request_size_bytes",\
+            int(request.META.get('CONTENT_LENGTH') or 0), **labels)
+
+
+class ProfilerMiddleware(SyncAndAsyncMiddleware):
+    """
+    Profile sampled requests with cProfile and save top stats with request
+    metadata (path, body size, duration) to WEIRDTEXT_PROFILER['DIRECTORY'].
+    Request is profiled with probability SAMPLE_RATE or when it has HEADER
+    header set to `1`. Nothing is profiled when ENABLED is False.
+    In async mode only the event loop thread is profiled (including other
+    requests served meanwhile), one request at a time.
+    """
+    @staticmethod
+    def sampled(request):
+        config = settings.WEIRDTEXT_PROFILER
+        return config['ENABLED'] and (request.headers.get(config['HEADER']) == '1'\
+            or random.random() < config['SAMPLE_RATE'])
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        response, profile, duration = run_profiled(self.get_response, request)
+        self.save(request, response, profile, duration)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # other request is profiled in the event loop thread
+            return await self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.disable()
+        self.save(request, response, profile, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def save(request, response, profile, duration):
+        config = settings.WEIRDTEXT_PROFILER
+        if profile is not None:
+            save_profile(config['DIRECTORY'], {
+                "path": request.path,
+                "method": request.method,
+                "status": response.status_code,
+                "content_length": int(request.META.get('CONTENT_LENGTH') or 0),
+                "duration": duration,
+                "timestamp": time.time(),
+            }, profile, config['TOP'], config['MAX_FILES'])
+
+
+class BodySizeLimitMiddleware(SyncAndAsyncMiddleware):
+    """
+    Reject requests with Content-Length over WEIRDTEXT_LIMITS['MAX_BODY_BYTES']
+    with 413 before the body is read. Paths from UNLIMITED_PATHS (streaming
+    endpoints) are not limited.
+    """
+    @staticmethod
+    def too_large(request):
+        limits = settings.WEIRDTEXT_LIMITS
+        return request.path not in limits['UNLIMITED_PATHS']\
+            and int(request.META.get('CONTENT_LENGTH') or 0) > limits['MAX_BODY_BYTES']
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.too_large(request):
+            return HttpResponse(status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.too_large(request):
+            return HttpResponse(status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return await self.get_response(request)
+
+
+class CompressionMiddleware(SyncAndAsyncMiddleware):
+    """
+    Decompress request bodies sent with gzip or zstd `Content-Encoding` and
+    compress responses with coding negotiated by `Accept-Encoding`.
+    Decompressed body is limited to WEIRDTEXT_LIMITS['MAX_BODY_BYTES'] (413),
+    bodies of UNLIMITED_PATHS (streaming endpoints) are decompressed on the fly.
+    """
+    min_size = 200
+
+    @staticmethod
+    def decompress_request(request):
+        """Replace compressed request body, return error response for incorrect body."""
+        coding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+        if coding == 'identity':
+            return None
+        if coding not in CONTENT_CODINGS:
+            return HttpResponse(status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        limits = settings.WEIRDTEXT_LIMITS
+        if request.path in limits['UNLIMITED_PATHS']:
+            # pylint: disable-next=protected-access
+            request._stream = decompressing_reader(request._stream, coding)
+        else:
+            try:
+                body = decompress(request.body, coding, limits['MAX_BODY_BYTES'])
+            except DECOMPRESSION_ERRORS:
+                return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+            if body is None:
+                return HttpResponse(status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            # pylint: disable=protected-access
+            request._body = body
+            request._stream = io.BytesIO(body)
+            request.META['CONTENT_LENGTH'] = str(len(body))
+        del request.META['HTTP_CONTENT_ENCODING']
+        request.__dict__.pop('headers', None)
+        return None
+
+    def compress_response(self, request, response):
+        coding = choose_coding(request.headers.get('Accept-Encoding', ''))
+        if coding is None or response.has_header('Content-Encoding')\
+            or response.streaming and response.is_async\
+            or not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            response.streaming_content = compress_sequence(response.streaming_content, coding)
+            del response.headers['Content-Length']
+        else:
+            content = compress(response.content, coding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+        # compressed representation has a weak ETag, like in GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        error_response = self.decompress_request(request)
+        if error_response is not None:
+            return error_response
+        return self.compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        error_response = self.decompress_request(request)
+        if error_response is not None:
+            return error_response
+        return self.compress_response(request, await self.get_response(request))
+
+
+class FastPathMiddleware(SyncAndAsyncMiddleware):
+    """
+    Call fast path views (with `fast_path` attribute, see encoder/fast_views.py)
+    directly, without the rest of the middleware chain: sessions, authentication,
+    CSRF, messages and security headers aren't used by the stateless JSON API.
+    Only paths starting with WEIRDTEXT_FAST_PATH_PREFIX are resolved here.
+    """
+    @staticmethod
+    def resolve_fast_view(request):
+        """Return resolved fast path view of the request, None for other views."""
+        if not request.path_info.startswith(settings.WEIRDTEXT_FAST_PATH_PREFIX):
+            return None
+        try:
+            resolver_match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None
+        if not getattr(resolver_match.func, 'fast_path', False):
+            return None
+        # used by MetricsMiddleware
+        request.resolver_match = resolver_match
+        return resolver_match.func
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        view = self.resolve_fast_view(request)
+        if view is None:
+            return self.get_response(request)
+        return view(request, *request.resolver_match.args, **request.resolver_match.kwargs)
+
+    async def __acall__(self, request):
+        view = self.resolve_fast_view(request)
+        if view is None:
+            return await self.get_response(request)
+        return await sync_to_async(view)(request, *request.resolver_match.args,\
+            **request.resolver_match.kwargs)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EncodedDocument',
+            fields=[
+                ('id', models.CharField(editable=False, max_length=64, primary_key=True,\
+                    serialize=False)),
+                ('mode', models.CharField(max_length=16)),
+                ('encoded_text', models.TextField()),
+                ('compressed_word_list', models.BinaryField()),
+                ('word_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
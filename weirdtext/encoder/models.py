@@ -1,3 +1,80 @@
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .cache import result_key
+
+
+class EncodedDocumentManager(models.Manager):
+    def store(self, original_text, mode, encoded_text, word_list, evict=True):
+        """
+        Save encoder output of the text (or refresh already saved one)
+        and evict old documents, unless `evict` is false (e.g. batch evicts once).
+        Returns the document.
+        """
+        document, _ = self.update_or_create(
+            id=EncodedDocument.make_id(original_text, mode),
+            defaults={
+                "mode": mode,
+                "encoded_text": encoded_text,
+                "compressed_word_list": EncodedDocument.compress_word_list(word_list),
+                "word_count": len(word_list),
+                "used_at": timezone.now(),
+            },
+        )
+        if evict:
+            self.evict()
+        return document
+
+    def evict(self):
+        """
+        Delete documents not used for WEIRDTEXT_DOCUMENTS['RETENTION'] seconds
+        and least recently used ones over MAX_DOCUMENTS.
+        """
+        config = settings.WEIRDTEXT_DOCUMENTS
+        self.filter(used_at__lt=timezone.now() - timedelta(seconds=config['RETENTION'])).delete()
+        excess = list(self.order_by('-used_at').values_list('id', flat=True)\
+            [config['MAX_DOCUMENTS']:])
+        if excess:
+            self.filter(id__in=excess).delete()
+
+
+class EncodedDocument(models.Model):
+    """
+    Encoder output saved by `/v1/encode/` with `store` option, so it can be
+    decoded by id (`/v1/decode/<id>/`) without sending it again.
+    Id is keyed hash of the original text and mode, so the same encoding is saved once.
+    """
+    id = models.CharField(primary_key=True, max_length=64, editable=False)
+    mode = models.CharField(max_length=16)
+    encoded_text = models.TextField()
+    # zlib compressed words separated with new lines
+    compressed_word_list = models.BinaryField()
+    word_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = EncodedDocumentManager()
+
+    @staticmethod
+    def make_id(original_text, mode):
+        return result_key('document', mode, original_text,\
+            settings.WEIRDTEXT_DIGEST_KEY.hex()).rsplit(':', 1)[1]
+
+    @staticmethod
+    def compress_word_list(word_list):
+        # words are `\w+` tokens, they never contain a new line
+        return zlib.compress("\n".join(word_list).encode('utf-8'))
+
+    @property
+    def word_list(self):
+        words = zlib.decompress(self.compressed_word_list).decode('utf-8')
+        return words.split("\n") if words else []
 
-# Create your models here.
+    def touch(self):
+        """Mark the document as used now, without loading it again."""
+        self.used_at = timezone.now()
+        EncodedDocument.objects.filter(id=self.id).update(used_at=self.used_at)
@@ -0,0 +1,96 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+
+def top_stats(profile, top):
+    """Return `top` functions of the profile sorted by cumulative time."""
+    stats = pstats.Stats(profile).stats
+    functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return [{
+        "function": f"{filename}:{line}({name})",
+        "calls": calls,
+        "tottime": tottime,
+        "cumtime": cumtime,
+    } for (filename, line, name), (_, calls, tottime, cumtime, _) in functions]
+
+
+def save_profile(directory, metadata, profile, top, max_files):
+    """
+    Write JSON file with request metadata and top stats of the profile
+    and remove the oldest files when there are more than `max_files`.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"profile-{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+    with open(path, 'w', encoding='utf-8') as profile_file:
+        json.dump(dict(metadata, stats=top_stats(profile, top)), profile_file)
+
+    profiles = sorted(directory.glob("profile-*.json"))
+    for old_profile in profiles[:max(0, len(profiles) - max_files)]:
+        try:
+            os.remove(old_profile)
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def run_profiled(function, *args):
+    """
+    Call function with cProfile enabled and return (result, profile, duration).
+    Profile is None if other profiler is already active in this thread.
+    """
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        profile = None
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+    finally:
+        duration = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+    return result, profile, duration
+
+
+def load_profiles(directory):
+    """Return list of saved profiles, unreadable files are skipped."""
+    profiles = []
+    for path in sorted(Path(directory).glob("profile-*.json")):
+        try:
+            with open(path, encoding='utf-8') as profile_file:
+                profiles.append(dict(json.load(profile_file), file=path.name))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def summarize(profiles, top):
+    """
+    Return summary of saved profiles: number of profiles per endpoint,
+    the slowest requests and functions with the biggest total cumulative time.
+    """
+    endpoints = defaultdict(int)
+    functions = defaultdict(lambda: {"calls": 0, "cumtime": 0.0, "profiles": 0})
+    for profile in profiles:
+        endpoints[f"{profile.get('method')} {profile.get('path')}"] += 1
+        for stat in profile.get("stats", []):
+            function = functions[stat["function"]]
+            function["calls"] += stat["calls"]
+            function["cumtime"] += stat["cumtime"]
+            function["profiles"] += 1
+    return {
+        "profiles": len(profiles),
+        "endpoints": dict(endpoints),
+        "slowest": sorted(profiles, key=lambda profile: profile.get("duration", 0),\
+            reverse=True)[:top],
+        "functions": sorted(functions.items(), key=lambda item: item[1]["cumtime"],\
+            reverse=True)[:top],
+    }
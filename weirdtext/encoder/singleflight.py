@@ -0,0 +1,146 @@
+"""
+Coalescing of identical concurrent encoder calls (single flight).
+
+The first call with a key runs the function, calls with the same key made while
+it's running wait for it and share its result (or exception), so a burst of
+identical requests is computed once per worker. SingleFlight coalesces threads,
+AsyncSingleFlight tasks of one event loop. FileLock extends it over processes
+(gunicorn workers) of one host, a result cache shared by them is the result store.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key made by threads of the process."""
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """Return `function(*args, **kwargs)`, or result of the running call with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent calls of coroutine functions with the same key made by tasks
+    of the event loop. The call is run as a separate task, so it isn't cancelled
+    when the task which started it is cancelled (e.g. client disconnected).
+    Calls are coalesced per event loop, a task can't be awaited from other loop
+    (e.g. loops of `async_to_sync` in threads of WSGI server).
+    """
+    def __init__(self):
+        self.coalesced = 0
+        self._tasks = {}
+
+    async def do(self, key, function, *args, **kwargs):
+        """
+        Return `await function(*args, **kwargs)`, or result of the running call
+        with the same key.
+        """
+        loop_key = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(loop_key)
+        if task is None:
+            task = asyncio.ensure_future(function(*args, **kwargs))
+            self._tasks[loop_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(loop_key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class FileLock:
+    """
+    Exclusive lock (flock) shared by processes, one of `stripes` lock files
+    in `directory` is chosen by hash of the key. Keys sharing a file are
+    serialized too, so there should be much more stripes than workers.
+    The directory is created when missing. Usable only on systems with `fcntl`.
+    """
+    poll_interval = 0.005
+
+    def __init__(self, directory, key, stripes=256, timeout=30):
+        stripe = int(hashlib.sha256(key.encode()).hexdigest(), 16) % stripes
+        self.path = os.path.join(directory, f"weirdtext-{stripe:04d}.lock")
+        self.timeout = timeout
+        self.contended = False
+        self.acquired = False
+        self._fd = None
+
+    def acquire(self):
+        """
+        Wait for the lock at most `timeout` seconds, return False if it wasn't acquired
+        (also when the lock file can't be opened). `contended` is set when other process
+        held the lock.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError:
+            return False
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                self.contended = True
+                if time.monotonic() >= deadline:
+                    os.close(self._fd)
+                    self._fd = None
+                    return False
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self.acquired = False
+
+    def __enter__(self):
+        """Acquire the lock, `acquired` is false when it failed and the caller runs unlocked."""
+        self.acquired = self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -1,11 +1,43 @@
+import asyncio
+import base64
 import copy
+import gzip
+import io
 import json
-from django.test import TestCase
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.test import Client, TestCase
+from django.utils import timezone
 from rest_framework.test import APIRequestFactory
 
-from encoder.views import EncodeApi, DecodeApi
-from encoder.encoder import weirdtext_encoder, weirdtext_decoder,\
-    SEPARATOR, extract_encoded_text
+from encoder import metrics
+from encoder.admission import admission, estimate_tokens, encode_cost, decode_cost
+from encoder.archive import SpilledWordList, iter_mmap_text
+from encoder.fast_views import validate_encode_body, validate_decode_body
+from encoder.formats import msgpack
+from encoder.singleflight import SingleFlight, AsyncSingleFlight, FileLock
+from encoder.models import EncodedDocument
+from encoder.cache import LRUResultCache, cached_encode, cached_decode, get_result_cache,\
+    result_key
+from encoder.views import EncodeApi, DecodeApi, EncodeBatchApi, DecodeBatchApi,\
+    EncodeStreamApi, EncodeIncrementalApi, validate_encode_data, validate_decode_data,\
+    coalesced, single_flight, request_decode_cost
+from encoder.encoder import weirdtext_encoder, weirdtext_decoder, scan_words,\
+    word_suitable_for_shuffle, no_punctation_token,\
+    weirdtext_digest, shuffle_middle, iter_encode, iter_decode, SEPARATOR, SHUFFLE_LEGACY,\
+    SHUFFLE_LOCAL, DECODER_FALLBACK_MODES, weirdtext_reencode, get_executor,\
+    extract_encoded_text, word_runs, expand_word_runs, weirdtext_hints, weirdtext_hint_decoder,\
+    weirdtext_hints_digest, permutation_digits, apply_permutation_digits
 
 
 TEST_ORIGINAL_TEXT = "This is a short (test) sentence,\nbut different than in task.\
@@ -40,6 +72,60 @@ class ApiEncodeTest(TestCase):
         assert isinstance(response.data['word_list'], list)
         assert self.encoded_text, self.word_list == weirdtext_encoder(TEST_ORIGINAL_TEXT)
 
+    def test_encode_incremental(self):
+        """
+        Test incremental re-encoding endpoint with previous result of encode endpoint.
+        """
+        request = self.factory.post("/v1/encode/", json.dumps({"original_text": TEST_ORIGINAL_TEXT,\
+            "mode": SHUFFLE_LOCAL}), content_type="application/json")
+        previous = self.view(request).data
+        data = dict(previous, original_text=TEST_ORIGINAL_TEXT,\
+            edits=[{"start": 0, "end": 4, "text": "That"}])
+        request = self.factory.post("/v1/encode/incremental/", json.dumps(data),\
+            content_type="application/json")
+        response = EncodeIncrementalApi.as_view()(request)
+
+        new_text = "That" + TEST_ORIGINAL_TEXT[4:]
+        assert response.status_code == 200
+        assert (response.data['encoded_text'], response.data['word_list']) ==\
+            weirdtext_encoder(new_text, mode=SHUFFLE_LOCAL)
+        request = self.factory.post("/v1/decode/", json.dumps(dict(response.data,\
+            original_text=new_text)), content_type="application/json")
+        assert DecodeApi.as_view()(request).data == {"decoded_text": new_text}
+
+        for incorrect_data in (dict(data, digest="0" * 64), dict(data, edits=[{"start": 5}])):
+            request = self.factory.post("/v1/encode/incremental/", json.dumps(incorrect_data),\
+                content_type="application/json")
+            assert EncodeIncrementalApi.as_view()(request).status_code == 400
+
+    def test_encode_etag(self):
+        """
+        Test GET variant of encode endpoint and conditional requests with ETag.
+        """
+        request = self.factory.get("/v1/encode/", {"original_text": TEST_ORIGINAL_TEXT})
+        response = self.view(request)
+        assert response.status_code == 200
+        assert (response.data['encoded_text'], response.data['word_list']) ==\
+            (self.encoded_text, self.word_list)
+        assert "max-age" in response['Cache-Control']
+        etag = response['ETag']
+
+        request = self.factory.get("/v1/encode/", {"original_text": TEST_ORIGINAL_TEXT},\
+            HTTP_IF_NONE_MATCH=etag)
+        assert self.view(request).status_code == 304
+        # POST isn't a safe method, it always gets the encoded text
+        request = self.factory.post("/v1/encode/",\
+            json.dumps({"original_text": TEST_ORIGINAL_TEXT}),\
+            content_type="application/json", HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        assert response.status_code == 200
+        assert response.data['encoded_text'] == self.encoded_text
+        request = self.factory.post("/v1/encode/", json.dumps({"original_text": "Other text"}),\
+            content_type="application/json", HTTP_IF_NONE_MATCH=etag)
+        assert self.view(request).status_code == 200
+        request = self.factory.get("/v1/encode/")
+        assert self.view(request).status_code == 422
+
     def test_error_raises(self):
         """
         Test if endpoint response raises correct errors for invalid data.
@@ -85,6 +171,25 @@ class ApiDecodeTest(TestCase):
         assert response.data['decoded_text'] == \
         weirdtext_decoder(self.encoded_text, self.word_list, TEST_ORIGINAL_TEXT)
 
+    def test_decode_with_digest(self):
+        """
+        Test if decode endpoint accepts digest returned by encode endpoint.
+        """
+        request = self.factory.post("/v1/encode/",\
+            json.dumps({"original_text": TEST_ORIGINAL_TEXT}), content_type="application/json")
+        encoded = EncodeApi.as_view()(request).data
+
+        request = self.factory.post("/v1/decode/", json.dumps(dict(self.data,\
+            digest=encoded['digest'])), content_type="application/json")
+        response = self.view(request)
+        assert response.status_code == 200
+        assert response.data['decoded_text'] == TEST_ORIGINAL_TEXT
+
+        request = self.factory.post("/v1/decode/", json.dumps(dict(self.data,\
+            digest="0" * 64)), content_type="application/json")
+        response = self.view(request)
+        assert response.status_code == 400
+
     def test_error_raises_encoded_text(self):
         """
         Test if endpoint response raises correct errors for invalid data.
@@ -137,6 +242,136 @@ class ApiDecodeTest(TestCase):
         assert response.status_code == 400
 
 
+class ApiBatchTest(TestCase):
+    """
+    Test if batch views response results for every item and handle errors.
+    """
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def test_encode_decode_batch(self):
+        """
+        Test encode and decode batch endpoints for correct and incorrect items.
+        """
+        texts = [TEST_ORIGINAL_TEXT, "Another longer sentence"]
+        items = [{"original_text": text} for text in texts] + [{}, {"original_text": 1}]
+        request = self.factory.post("/v1/encode/batch/", json.dumps({"items": items}),\
+            content_type="application/json")
+        response = EncodeBatchApi.as_view()(request)
+        assert response.status_code == 200
+        results = response.data['results']
+        assert [result.get('error') for result in results] == [None, None, 422, 400]
+        for text, result in zip(texts, results):
+            assert (result['encoded_text'], result['word_list']) == weirdtext_encoder(text)
+
+        items = [dict(result, original_text=text) for text, result in zip(texts, results)]
+        items.append(dict(items[0], encoded_text=SEPARATOR))
+        request = self.factory.post("/v1/decode/batch/", json.dumps({"items": items}),\
+            content_type="application/json")
+        response = DecodeBatchApi.as_view()(request)
+        assert response.status_code == 200
+        assert response.data['results'] == [{"decoded_text": text} for text in texts]\
+            + [{"error": 400}]
+
+    def test_batch_result_cache(self):
+        """
+        Test if repeated batch items are taken from result cache.
+        """
+        text = TEST_ORIGINAL_TEXT + " batch"
+        with self.settings(WEIRDTEXT_RESULT_CACHE={'BACKEND': 'encoder.cache.LRUResultCache'}):
+            request = self.factory.post("/v1/encode/batch/",\
+                json.dumps({"items": [{"original_text": text}] * 3}),\
+                content_type="application/json")
+            results = EncodeBatchApi.as_view()(request).data['results']
+            assert get_result_cache().stats()['hits'] == 2
+
+            items = [dict(results[0], original_text=text)] * 3
+            request = self.factory.post("/v1/decode/batch/", json.dumps({"items": items}),\
+                content_type="application/json")
+            response = DecodeBatchApi.as_view()(request)
+            assert response.data['results'] == [{"decoded_text": text}] * 3
+            assert get_result_cache().stats()['hits'] == 4
+
+    def test_error_raises(self):
+        """
+        Test if batch endpoints raise correct errors for invalid data.
+        """
+        for view in (EncodeBatchApi.as_view(), DecodeBatchApi.as_view()):
+            request = self.factory.post("/v1/encode/batch/", {}, content_type="application/json")
+            assert view(request).status_code == 422
+            request = self.factory.post("/v1/encode/batch/", json.dumps({"items": "text"}),\
+                content_type="application/json")
+            assert view(request).status_code == 400
+
+
+class ApiEncodeStreamTest(TestCase):
+    """
+    Test if streaming encode view responses the same data as encode view.
+    """
+    def test_encode_stream(self):
+        factory = APIRequestFactory()
+        request = factory.post("/v1/encode/stream/", TEST_ORIGINAL_TEXT.encode(),\
+            content_type="text/plain")
+        with self.settings(WEIRDTEXT_STREAM_BLOCK_SIZE=7):
+            response = EncodeStreamApi.as_view()(request)
+            data = json.loads(b"".join(response.streaming_content))
+
+        assert response.status_code == 200
+        assert (data['encoded_text'], data['word_list']) == weirdtext_encoder(TEST_ORIGINAL_TEXT)
+
+    def test_encode_stream_spilled_words(self):
+        text = TEST_ORIGINAL_TEXT * 20
+        request = APIRequestFactory().post("/v1/encode/stream/", text.encode(),\
+            content_type="text/plain")
+        # word list is over the budget and sorted on disk
+        with self.settings(WEIRDTEXT_STREAM_BLOCK_SIZE=64, WEIRDTEXT_STREAM_MEMORY_BUDGET=200):
+            response = EncodeStreamApi.as_view()(request)
+            data = json.loads(b"".join(response.streaming_content))
+        assert (data['encoded_text'], data['word_list']) == weirdtext_encoder(text)
+
+
+class ResultCacheTest(TestCase):
+    """
+    Test if encode and decode results are memoized and evicted correctly.
+    """
+    def test_lru_eviction(self):
+        cache = LRUResultCache(max_entries=2, max_bytes=10000)
+        cache.set("a", "first")
+        cache.set("b", "second")
+        assert cache.get("a") == "first"
+        cache.set("c", "third")
+        assert cache.get("b") is None
+        assert cache.get("c") == "third"
+        assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+        cache = LRUResultCache(max_entries=10, max_bytes=200)
+        cache.set("a", "x" * 100)
+        cache.set("b", "y" * 100)
+        assert cache.get("a") is None and cache.get("b") is not None
+        cache.set("c", "z" * 1000)
+        assert cache.get("c") is None
+
+    def test_cached_encode_decode(self):
+        for config in ({'BACKEND': 'encoder.cache.LRUResultCache'},\
+            {'BACKEND': 'encoder.cache.DjangoResultCache', 'OPTIONS': {'alias': 'default'}}):
+            with self.settings(WEIRDTEXT_RESULT_CACHE=config):
+                expected = weirdtext_encoder(TEST_ORIGINAL_TEXT)
+                assert cached_encode(TEST_ORIGINAL_TEXT) == expected
+                assert cached_encode(TEST_ORIGINAL_TEXT) == expected
+                for _ in range(2):
+                    assert cached_decode(*expected, TEST_ORIGINAL_TEXT) == TEST_ORIGINAL_TEXT
+                assert get_result_cache().stats()['hits'] == 3
+                with self.assertRaisesMessage(ValueError, "Incorrect encoded text."):
+                    cached_decode(expected[0] + "add", expected[1], TEST_ORIGINAL_TEXT)
+
+                # result with digest checked under one key isn't reused with another key
+                digest = weirdtext_digest(*expected, TEST_ORIGINAL_TEXT, b"key")
+                assert cached_decode(*expected, TEST_ORIGINAL_TEXT, digest, b"key")\
+                    == TEST_ORIGINAL_TEXT
+                with self.assertRaises(ValueError):
+                    cached_decode(*expected, TEST_ORIGINAL_TEXT, digest, b"rotated key")
+
+
 class TestEncoderMechanism(TestCase):
     """
     Test if encoder algorithm is implement with correct functionals.
@@ -153,6 +388,67 @@ class TestEncoderMechanism(TestCase):
         # check if every word is shuffled
         assert not any(enc == org for enc, org in zip(encoded_text.split(), original_words))
 
+    def test_encoder_is_deterministic(self):
+        """
+        Test if encoder output doesn't depend on global random state or other threads.
+        """
+        text = "Text where words should shuffled, doesn't it?"
+        expected = ("\n--weird--\nTxet wrhee wdors slhuod sfhufeld, dsoen't it?\n--weird--\n",\
+            ['doesn', 'should', 'shuffled', 'Text', 'where', 'words'])
+        random.seed(1)
+        assert weirdtext_encoder(text, mode=SHUFFLE_LEGACY) == expected
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(weirdtext_encoder, [text] * 64, [30] * 64,\
+                [SHUFFLE_LEGACY] * 64))
+        assert all(result == expected for result in results)
+
+    def test_shuffle_middle_always_differs(self):
+        """
+        Test if single shuffle of middle with few permutations is different than original.
+        """
+        rng = random.Random(0)
+        for middle in ("ab", "aab", "abb", "aaab", "xyz"):
+            for _ in range(100):
+                shuffled = shuffle_middle(middle, rng)
+                assert shuffled != middle
+                assert sorted(shuffled) == sorted(middle)
+
+    def test_iter_encode(self):
+        """
+        Test if encoding text in chunks gives the same result as encoding whole text.
+        """
+        for size in (1, 2, 5, 13):
+            chunks = [TEST_ORIGINAL_TEXT[i:i + size]\
+                for i in range(0, len(TEST_ORIGINAL_TEXT), size)]
+            words = []
+            encoded_text = "".join(iter_encode(chunks, words))
+            assert (encoded_text, sorted(words, key=lambda s: s.lower())) ==\
+                weirdtext_encoder(TEST_ORIGINAL_TEXT)
+
+    def test_parallel_encoding(self):
+        """
+        Test if text encoded in process pool is the same as encoded in one process.
+        """
+        text = TEST_ORIGINAL_TEXT * 20
+        for shard_size in (7, 64, 500):
+            expected = weirdtext_encoder(text, shard_size=shard_size)
+            assert weirdtext_encoder(text, workers=3, shard_size=shard_size) == expected
+            chunks = [text[i:i + 100] for i in range(0, len(text), 100)]
+            words = []
+            assert "".join(iter_encode(chunks, words, shard_size=shard_size)) == expected[0]
+        # one pool is shared by all parallel calls
+        assert get_executor(3) is get_executor(8)
+
+    def test_scan_words(self):
+        """
+        Test if scanner finds the same words and suitability as regex split.
+        """
+        text = TEST_ORIGINAL_TEXT + " żółw ŻÓŁW 1234 a_b_ __ x²y ñandú ǅemal"
+        words = [word for word in no_punctation_token.split(text)\
+            if no_punctation_token.match(word)]
+        assert [(text[start:end], suitable) for start, end, suitable in scan_words(text)] ==\
+            [(word, word_suitable_for_shuffle(word)) for word in words]
+
     def test_three_letter_word(self):
         """
         Test if encoder doesn't shuffle three letter word.
@@ -209,6 +505,72 @@ class TestDecoderMechanism(TestCase):
         decoded_text = weirdtext_decoder(encoded_text, word_list, text_with_puncation)
         assert decoded_text == text_with_puncation
 
+    def test_decode_words_with_equal_edges(self):
+        """
+        Test if decoder maps words with the same length and letters on the edges.
+        """
+        text_with_equal_edges = "Silt, slot and stat; stat then silt, Slot and SILT."
+        encoded_text, word_list = weirdtext_encoder(text_with_equal_edges)
+        decoded_text = weirdtext_decoder(encoded_text, word_list, text_with_equal_edges)
+        assert decoded_text == text_with_equal_edges
+
+    def test_reencode_local(self):
+        """
+        Test if incremental re-encoding in local mode is the same as encoding edited text.
+        """
+        encoded_text, word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT, mode=SHUFFLE_LOCAL)
+        assert weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT,\
+            mode=SHUFFLE_LOCAL) == TEST_ORIGINAL_TEXT
+        edits = [(0, 4, "That"), (10, 15, "longer"), (24, 24, " Sentence"), (52, 56, "biig")]
+        new_text = TEST_ORIGINAL_TEXT
+        for start, end, text in reversed(edits):
+            new_text = new_text[:start] + text + new_text[end:]
+
+        assert weirdtext_reencode(TEST_ORIGINAL_TEXT, encoded_text, word_list, edits) ==\
+            (new_text, *weirdtext_encoder(new_text, mode=SHUFFLE_LOCAL))
+        for incorrect_edits in ([(5, 4, "")], [(10, 12, ""), (11, 13, "")], [(0, 1000, "")]):
+            with self.assertRaises(ValueError):
+                weirdtext_reencode(TEST_ORIGINAL_TEXT, encoded_text, word_list, incorrect_edits)
+        with self.assertRaises(ValueError):
+            weirdtext_reencode(TEST_ORIGINAL_TEXT, encoded_text, [], [(0, 4, "That")])
+
+    def test_hint_decoder(self):
+        """
+        Test if encoded text is decoded with permutation hints only, in both modes.
+        """
+        assert permutation_digits("abc", "abc") == [0, 0, 0]
+        assert permutation_digits("abc", "cab") == [1, 1, 0]
+        assert apply_permutation_digits("cab", [1, 1, 0]) == "abc"
+        for text in (TEST_ORIGINAL_TEXT, "Silt, slot and stat; stat then silt, Slot and SILT.",\
+            "Zażółć gęślą jaźń, " * 3, ""):
+            for mode in ("bounded", SHUFFLE_LEGACY):
+                encoded_text, _ = weirdtext_encoder(text, mode=mode)
+                hints = weirdtext_hints(text, encoded_text)
+                assert weirdtext_hint_decoder(encoded_text, hints) == text
+
+        encoded_text, _ = weirdtext_encoder(TEST_ORIGINAL_TEXT)
+        hints = weirdtext_hints(TEST_ORIGINAL_TEXT, encoded_text)
+        digest = weirdtext_hints_digest(encoded_text, hints, b"key")
+        assert weirdtext_hint_decoder(encoded_text, hints, digest, b"key") == TEST_ORIGINAL_TEXT
+        # digits out of range, not in the shortest form, longer than the word needs
+        for incorrect_hints in (hints[:-4], hints + "AA==", "not base64!", "/w==", "gAA=",\
+            base64.b64encode(b"\xff" * 1000).decode()):
+            with self.assertRaises(ValueError):
+                weirdtext_hint_decoder(encoded_text, incorrect_hints)
+        with self.assertRaises(ValueError):
+            weirdtext_hint_decoder(encoded_text, hints, digest, b"other key")
+
+    def test_hints_long_word(self):
+        """
+        Test if hints of a very long word are computed and decoded in O(n log n).
+        """
+        text = "L" + "".join(random.Random(1).choice("abcdefghij") for _ in range(50000)) + "g"
+        start = time.perf_counter()
+        encoded_text, _ = weirdtext_encoder(text)
+        hints = weirdtext_hints(text, encoded_text)
+        assert weirdtext_hint_decoder(encoded_text, hints) == text
+        assert time.perf_counter() - start < 5
+
     def test_raises_error_for_incorrect_input(self):
         """
         Test if decoder raises error when given encoded_text with word_list
@@ -225,3 +587,733 @@ class TestDecoderMechanism(TestCase):
         encoded_text += "add"
         with self.assertRaisesMessage(ValueError, "Incorrect encoded text."):
             weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT)
+
+    def test_iter_decode(self):
+        """
+        Test if decoding text in chunks gives original text, also when chunks
+        split words and separators.
+        """
+        encoded_text, word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT)
+        for size in (1, 3, 8, 11):
+            chunks = [encoded_text[i:i + size] for i in range(0, len(encoded_text), size)]
+            assert "".join(iter_decode(chunks, word_list)) == TEST_ORIGINAL_TEXT
+
+    def test_decode_legacy_mode(self):
+        """
+        Test if decoder accepts text encoded in legacy shuffle mode without digest.
+        """
+        encoded_text, word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT, mode=SHUFFLE_LEGACY)
+        decoded_text = weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT)
+        assert decoded_text == TEST_ORIGINAL_TEXT
+
+    def test_decode_given_mode(self):
+        """
+        Test if decoder encodes original text again only in given mode.
+        """
+        encoded_text, word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT, mode=SHUFFLE_LOCAL)
+        with self.assertRaises(ValueError):
+            weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT)
+        calls = []
+
+        def encoder(text, mode):
+            calls.append(mode)
+            return weirdtext_encoder(text, mode=mode)
+        with self.assertRaises(ValueError):
+            weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT, encoder=encoder,\
+                mode=SHUFFLE_LEGACY)
+        assert calls == [SHUFFLE_LEGACY]
+        assert weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT,\
+            mode=SHUFFLE_LOCAL) == TEST_ORIGINAL_TEXT
+
+    def test_digest(self):
+        """
+        Test if decoder checks input with digest instead of encoding original text.
+        """
+        key = b"test-key"
+        encoded_text, word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT)
+        digest = weirdtext_digest(encoded_text, word_list, TEST_ORIGINAL_TEXT, key)
+        decoded_text = weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT,\
+            digest=digest, key=key)
+        assert decoded_text == TEST_ORIGINAL_TEXT
+
+        with self.assertRaisesMessage(ValueError, "Incorrect encoded text."):
+            weirdtext_decoder(encoded_text + "add", word_list, TEST_ORIGINAL_TEXT,\
+                digest=digest, key=key)
+        with self.assertRaisesMessage(ValueError, "Incorrect encoded text."):
+            weirdtext_decoder(encoded_text, word_list, TEST_ORIGINAL_TEXT,\
+                digest=digest, key=b"other-key")
+
+
+class BulkCommandTest(TestCase):
+    """
+    Test if encode/decode commands process JSONL files in order, serially and in parallel.
+    """
+    def test_encode_decode_jsonl(self):
+        texts = [TEST_ORIGINAL_TEXT, "Silt, slot and stat", "", "Zażółć gęślą jaźń"]
+        with tempfile.TemporaryDirectory() as directory:
+            records = os.path.join(directory, "records.jsonl")
+            with open(records, "w", encoding="utf-8") as records_file:
+                for text in texts:
+                    records_file.write(json.dumps({"original_text": text}) + "\n")
+                records_file.write("not json\n\n")
+                records_file.write(json.dumps({"original_text": "short text", "hints": True}))
+                records_file.write("\n" + json.dumps({"original_text": "stored", "store": True}))
+                records_file.write("\n" + json.dumps({"original_text": "big", "parallel": True}))
+
+            results = []
+            for workers in (1, 2):
+                output, errors = io.StringIO(), io.StringIO()
+                call_command("weirdtext_encode", records, jsonl=True, workers=workers, window=2,\
+                    stdout=output, stderr=errors)
+                results.append([json.loads(line) for line in output.getvalue().splitlines()])
+                assert "8 records (3 errors)" in errors.getvalue()
+            assert results[0] == results[1]
+            encoded = results[0]
+            assert [(item['encoded_text'], item['word_list']) for item in encoded[:4]] ==\
+                [weirdtext_encoder(text) for text in texts]
+            assert encoded[4] == encoded[6] == encoded[7] == {"error": 400}
+
+            encoded_records = os.path.join(directory, "encoded.jsonl")
+            with open(encoded_records, "w", encoding="utf-8") as encoded_file:
+                for text, item in zip(texts, encoded[:4]):
+                    encoded_file.write(json.dumps(dict(item, original_text=text)) + "\n")
+                encoded_file.write(json.dumps(encoded[5]) + "\n")
+                encoded_file.write(json.dumps(dict(encoded[0], original_text="other")) + "\n")
+            decoded = os.path.join(directory, "decoded.jsonl")
+            call_command("weirdtext_decode", encoded_records, jsonl=True, workers=2,\
+                output=decoded, stderr=io.StringIO())
+            with open(decoded, encoding="utf-8") as decoded_file:
+                assert [json.loads(line) for line in decoded_file] ==\
+                    [{"decoded_text": text} for text in texts + ["short text"]] + [{"error": 400}]
+
+
+class ArchiveEncodeTest(TestCase):
+    """
+    Test if huge file encoding from memory map with word list sorted on disk
+    gives the same result as the encoder.
+    """
+    def test_spilled_word_list(self):
+        words = [random.Random(seed).choice(["word", "Word", "WORD", "ab", "Zeta", "beta"])\
+            + str(seed % 3) * (seed % 2) for seed in range(500)]
+        with SpilledWordList(memory_budget=1000) as word_list:
+            for word in words:
+                word_list.append(word)
+            assert len(word_list._runs) > 1  # pylint: disable=protected-access
+            assert list(word_list.sorted_words()) == sorted(words, key=lambda s: s.lower())
+
+    def test_encode_mmap(self):
+        text = (TEST_ORIGINAL_TEXT + " Zażółć gęślą jaźń.\n") * 50
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "archive.txt")
+            with open(path, "w", encoding="utf-8") as archive:
+                archive.write(text)
+            assert "".join(iter_mmap_text(path, block_size=7)) == text
+
+            output = os.path.join(directory, "archive.json")
+            for mode in ("bounded", SHUFFLE_LEGACY):
+                call_command("weirdtext_encode", path, mmap=True, mode=mode, output=output,\
+                    block_size=7, memory_budget=2000)
+                with open(output, encoding="utf-8") as result:
+                    data = json.load(result)
+                assert (data['encoded_text'], data['word_list']) ==\
+                    weirdtext_encoder(text, mode=mode)
+
+
+class BenchmarkCommandTest(TestCase):
+    """
+    Test if benchmark command measures targets and detects regressions.
+    """
+    def test_benchmark_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            options = {"sizes": "20", "distributions": "latin,unicode", "repeat": 1,\
+                "stdout": io.StringIO()}
+            call_command("weirdtext_benchmark", save_baseline=baseline, **options)
+            with open(baseline, encoding="utf-8") as baseline_file:
+                results = json.load(baseline_file)
+            assert len(results) == 8
+            assert all(result['p50'] > 0 for result in results.values())
+
+            for result in results.values():
+                result['p50'] = result['p99'] = 1e-9
+            with open(baseline, "w", encoding="utf-8") as baseline_file:
+                json.dump(results, baseline_file)
+            with self.assertRaisesMessage(CommandError, "Performance regressions"):
+                call_command("weirdtext_benchmark", baseline=baseline, **options)
+
+
+class MetricsTest(TestCase):
+    """
+    Test if metrics are collected and exposed only when enabled.
+    """
+    def setUp(self):
+        metrics.reset()
+        self.client = Client()
+
+    def test_metrics_disabled(self):
+        with self.settings(WEIRDTEXT_METRICS_ENABLED=False, ALLOWED_HOSTS=['testserver']):
+            weirdtext_encoder(TEST_ORIGINAL_TEXT)
+            assert metrics.render().count("_count") == 0
+            assert self.client.get("/metrics").status_code == 404
+
+    def test_metrics_enabled(self):
+        with self.settings(WEIRDTEXT_METRICS_ENABLED=True, ALLOWED_HOSTS=['testserver'],\
+            WEIRDTEXT_RESULT_CACHE={'BACKEND': None}):
+            response = self.client.post("/v1/decode/", json.dumps({\
+                "original_text": TEST_ORIGINAL_TEXT, "encoded_text": SEPARATOR, "word_list": [],\
+            }), content_type="application/json")
+            assert response.status_code == 400
+            response = self.client.get("/metrics")
+            assert response.status_code == 200
+            exposition = response.content.decode()
+            assert 'weirdtext_request_duration_seconds_count{endpoint="v1/decode/",method="POST",'\
+                'status="400"} 1' in exposition
+            assert 'weirdtext_phase_duration_seconds_count{phase="decode.verify_encode"} 1'\
+                in exposition
+            # incorrect input without mode is encoded again in fallback modes only
+            assert 'weirdtext_phase_duration_seconds_count{phase="encode.shuffle"} '\
+                f'{len(DECODER_FALLBACK_MODES)}' in exposition
+
+
+class ProfilerTest(TestCase):
+    """
+    Test if sampled requests are profiled, rotated and summarized.
+    """
+    def test_profile_requests_with_header(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'ENABLED': True, 'SAMPLE_RATE': 0, 'HEADER': 'X-Weirdtext-Profile',\
+                'DIRECTORY': directory, 'TOP': 5, 'MAX_FILES': 2}
+            with self.settings(WEIRDTEXT_PROFILER=config, ALLOWED_HOSTS=['testserver']):
+                client = Client()
+                client.post("/v1/encode/", json.dumps({"original_text": TEST_ORIGINAL_TEXT}),\
+                    content_type="application/json")
+                assert not os.listdir(directory)
+                for _ in range(3):
+                    client.post("/v1/encode/", json.dumps({"original_text": TEST_ORIGINAL_TEXT}),\
+                        content_type="application/json", HTTP_X_WEIRDTEXT_PROFILE="1")
+                assert len(os.listdir(directory)) == 2
+
+                output = io.StringIO()
+                call_command("weirdtext_profiles", directory=directory, stdout=output)
+                assert "Profiles: 2" in output.getvalue()
+                assert "POST /v1/encode/: 2" in output.getvalue()
+
+
+class AsyncApiTest(TestCase):
+    """
+    Test if async views response the same data as sync views and apply backpressure.
+    """
+    def setUp(self):
+        self.client = Client()
+
+    def test_async_encode_decode(self):
+        with self.settings(ALLOWED_HOSTS=['testserver']):
+            response = self.client.post("/v1/async/encode/",\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT}), content_type="application/json")
+            assert response.status_code == 200
+            data = response.json()
+            assert (data['encoded_text'], data['word_list']) ==\
+                weirdtext_encoder(TEST_ORIGINAL_TEXT)
+
+            response = self.client.post("/v1/async/decode/",\
+                json.dumps(dict(data, original_text=TEST_ORIGINAL_TEXT)),\
+                content_type="application/json")
+            assert response.status_code == 200
+            assert response.json() == {"decoded_text": TEST_ORIGINAL_TEXT}
+
+            response = self.client.post("/v1/async/decode/", json.dumps({"encoded_text": ""}),\
+                content_type="application/json")
+            assert response.status_code == 422
+            response = self.client.post("/v1/async/encode/", "not json",\
+                content_type="application/json")
+            assert response.status_code == 400
+            # async server doesn't share the database of `/v1/decode/<id>/`
+            response = self.client.post("/v1/async/encode/",\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT, "store": True}),\
+                content_type="application/json")
+            assert response.status_code == 400
+            assert not EncodedDocument.objects.exists()
+
+    def test_async_overloaded(self):
+        config = {'EXECUTOR': 'thread', 'WORKERS': 1, 'MAX_PENDING': 0, 'RETRY_AFTER': 5}
+        with self.settings(ALLOWED_HOSTS=['testserver'], WEIRDTEXT_ASYNC=config):
+            response = self.client.post("/v1/async/encode/",\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT}), content_type="application/json")
+            assert response.status_code == 503
+            assert response['Retry-After'] == "5"
+
+
+class FastPathTest(TestCase):
+    """
+    Test if fast path views response the same as DRF views and skip the middleware chain.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.encoded_text, self.word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT)
+
+    def test_compiled_validators(self):
+        encode_bodies = [{}, {"original_text": 1}, {"original_text": "a", "mode": "local"},\
+            {"original_text": "a", "mode": "other"}, {"original_text": "a", "parallel": 1},\
+            {"original_text": "a", "word_runs": True, "hints": False, "store": "no"},\
+            {"mode": 1}]
+        for data in encode_bodies:
+            assert validate_encode_body(data) == validate_encode_data(data), data
+        decode_bodies = [{}, {"encoded_text": ""}, {"encoded_text": "", "hints": ""},\
+            {"encoded_text": 1, "hints": "", "digest": ""},\
+            {"encoded_text": "", "hints": "", "digest": None},\
+            {"encoded_text": "", "original_text": "", "word_list": []},\
+            {"encoded_text": "", "original_text": 1, "word_list": []},\
+            {"encoded_text": "", "original_text": "", "word_list": {}},\
+            {"encoded_text": "", "original_text": "", "word_runs": [["a", 2]]},\
+            {"encoded_text": "", "original_text": "", "word_runs": [["a", "2"]]},\
+            {"encoded_text": "", "original_text": "", "word_runs": [["a", True, 1]]},\
+            {"encoded_text": "", "original_text": "", "word_runs": "a"},\
+            {"original_text": 1, "word_list": 1}]
+        for data in decode_bodies:
+            assert validate_decode_body(data) == validate_decode_data(data), data
+
+    def test_fast_encode_decode(self):
+        bodies = {
+            "encode": [json.dumps({"original_text": TEST_ORIGINAL_TEXT, "word_runs": True}),\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT, "mode": "legacy"}),\
+                json.dumps({"mode": "legacy"}), json.dumps({"original_text": []}), "not json"],
+            "decode": [json.dumps({"encoded_text": self.encoded_text, "word_list": self.word_list,\
+                "original_text": TEST_ORIGINAL_TEXT}),\
+                json.dumps({"encoded_text": "", "word_list": [],\
+                    "original_text": TEST_ORIGINAL_TEXT}),\
+                json.dumps({"encoded_text": self.encoded_text})],
+        }
+        with self.settings(ALLOWED_HOSTS=['testserver']):
+            for name, payloads in bodies.items():
+                for body in payloads:
+                    expected = self.client.post(f"/v1/{name}/", body,\
+                        content_type="application/json")
+                    response = self.client.post(f"/v1/fast/{name}/", body,\
+                        content_type="application/json")
+                    assert response.status_code == expected.status_code, body
+                    if response.status_code == 200 or response.content:
+                        assert response.json() == expected.json(), body
+                    # XFrameOptionsMiddleware is skipped
+                    assert 'X-Frame-Options' in expected and 'X-Frame-Options' not in response
+
+            response = self.client.post("/v1/fast/decode/", "[]", content_type="application/json")
+            assert response.status_code == 400
+            response = self.client.get("/v1/fast/encode/")
+            assert response.status_code == 405
+
+    def test_benchmark_overhead(self):
+        stdout = io.StringIO()
+        call_command("weirdtext_benchmark", overhead=True, repeat=2, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        assert [line.split()[0] for line in lines[1:]] == ["encode", "decode"]
+
+
+def wait_for(condition, timeout=5):
+    """Wait until condition() is true (other threads got to the expected point)."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+class SingleFlightTest(TestCase):
+    """
+    Test if concurrent identical calls are computed once and share the result.
+    """
+    def run_coalesced(self, flight, function, followers=4):
+        """Call function in leader and follower threads, return their results or exceptions."""
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def call():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return function()
+
+        def run(results, index):
+            try:
+                results[index] = flight.do("key", call)
+            except ValueError as exc:
+                results[index] = exc
+
+        results = [None] * (followers + 1)
+        threads = [threading.Thread(target=run, args=(results, index))\
+            for index in range(followers + 1)]
+        threads[0].start()
+        started.wait()
+        coalesced_before = flight.coalesced
+        for thread in threads[1:]:
+            thread.start()
+        wait_for(lambda: flight.coalesced == coalesced_before + followers)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        return results
+
+    def test_single_flight_threads(self):
+        flight = SingleFlight()
+        results = self.run_coalesced(flight, lambda: ["result"])
+        assert all(result is results[0] for result in results)
+        assert results[0] == ["result"]
+
+        def fail():
+            raise ValueError("incorrect")
+        results = self.run_coalesced(flight, fail)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.do("key", lambda: 1) == 1
+
+    def test_single_flight_async(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        async def main():
+            tasks = [asyncio.ensure_future(flight.do("key", compute, index)) for index in range(5)]
+            await asyncio.sleep(0)
+            # cancelled caller doesn't cancel the call of the others
+            tasks[0].cancel()
+            return await asyncio.gather(*tasks[1:])
+        assert asyncio.run(main()) == [0, 0, 0, 0]
+        assert calls == [0]
+        assert flight.coalesced == 4
+
+    def test_single_flight_async_loops(self):
+        """
+        Test if calls of other event loop (thread) aren't coalesced with a running call.
+        """
+        flight = AsyncSingleFlight()
+        started = threading.Event()
+
+        async def compute(value):
+            started.set()
+            await asyncio.sleep(0.05)
+            return value
+        results = []
+        thread = threading.Thread(target=lambda: results.append(\
+            asyncio.run(flight.do("key", compute, 1))))
+        thread.start()
+        started.wait()
+        results.append(asyncio.run(flight.do("key", compute, 2)))
+        thread.join()
+        assert sorted(results) == [1, 2]
+        assert flight.coalesced == 0
+
+    def test_coalesced_admission(self):
+        limits = dict(settings.WEIRDTEXT_LIMITS, MAX_COST_IN_FLIGHT=10, QUEUE_TIMEOUT=0)
+        flight = {'ENABLED': True, 'LOCK_DIRECTORY': None, 'LOCK_STRIPES': 1, 'LOCK_TIMEOUT': 1}
+        with self.settings(WEIRDTEXT_LIMITS=limits, WEIRDTEXT_SINGLE_FLIGHT=flight):
+            # followers wait for the admitted leader, they don't need capacity
+            coalesced_before = single_flight.coalesced
+            release = threading.Event()
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(\
+                coalesced("key", 10, release.wait))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            wait_for(lambda: single_flight.coalesced == coalesced_before + 3)
+            release.set()
+            for thread in threads:
+                thread.join()
+            assert results == [True] * 4
+
+    def test_file_lock_result_store(self):
+        text = TEST_ORIGINAL_TEXT + " file lock"
+        key = result_key('encode', "bounded", text)
+        with tempfile.TemporaryDirectory() as directory:
+            flight = {'ENABLED': True, 'LOCK_DIRECTORY': directory, 'LOCK_STRIPES': 4,\
+                'LOCK_TIMEOUT': 5}
+            with self.settings(WEIRDTEXT_SINGLE_FLIGHT=flight), mock.patch(\
+                "encoder.cache.weirdtext_encoder", side_effect=weirdtext_encoder) as encoder:
+                # lock held by "other process", which stores its result in the cache
+                lock = FileLock(directory, key, 4)
+                assert lock.acquire()
+                results = []
+                thread = threading.Thread(target=lambda: results.append(cached_encode(text)))
+                thread.start()
+                time.sleep(0.05)
+                assert not results
+                get_result_cache().set(key, ("stored", ["word"]))
+                lock.release()
+                thread.join()
+                assert results == [("stored", ["word"])]
+                assert encoder.call_count == 0
+
+                assert cached_encode(text + "!") == weirdtext_encoder(text + "!")
+                assert encoder.call_count == 1
+
+    def test_file_lock_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            missing = os.path.join(directory, "missing", "locks")
+            with FileLock(missing, "key") as lock:
+                assert lock.acquired
+                assert os.path.isdir(missing)
+            assert not lock.acquired
+
+            # lock directory can't be created, the result is computed without the lock
+            unusable = os.path.join(directory, "file")
+            with open(unusable, "w", encoding="utf-8"):
+                pass
+            with FileLock(unusable, "key") as lock:
+                assert not lock.acquired
+            flight = {'ENABLED': True, 'LOCK_DIRECTORY': unusable, 'LOCK_STRIPES': 4,\
+                'LOCK_TIMEOUT': 5}
+            text = TEST_ORIGINAL_TEXT + " unusable lock"
+            with self.settings(WEIRDTEXT_SINGLE_FLIGHT=flight):
+                assert cached_encode(text) == weirdtext_encoder(text)
+
+    def test_file_lock_timeout(self):
+        text = TEST_ORIGINAL_TEXT + " lock timeout"
+        with tempfile.TemporaryDirectory() as directory:
+            flight = {'ENABLED': True, 'LOCK_DIRECTORY': directory, 'LOCK_STRIPES': 1,\
+                'LOCK_TIMEOUT': 0.05}
+            with self.settings(WEIRDTEXT_SINGLE_FLIGHT=flight), mock.patch(\
+                "encoder.cache.weirdtext_encoder", side_effect=weirdtext_encoder) as encoder:
+                # "other process" holds the lock and doesn't store a result
+                lock = FileLock(directory, "other", 1)
+                assert lock.acquire()
+                try:
+                    assert cached_encode(text) == weirdtext_encoder(text)
+                    assert encoder.call_count == 1
+                finally:
+                    lock.release()
+
+    def test_file_lock_not_nested(self):
+        """
+        Test if decode holding the lock encodes original text without locking
+        again, its key would share the only stripe.
+        """
+        encoded_text, word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT + " nested")
+        with tempfile.TemporaryDirectory() as directory:
+            flight = {'ENABLED': True, 'LOCK_DIRECTORY': directory, 'LOCK_STRIPES': 1,\
+                'LOCK_TIMEOUT': 3}
+            with self.settings(WEIRDTEXT_SINGLE_FLIGHT=flight):
+                start = time.perf_counter()
+                assert cached_decode(encoded_text, word_list, TEST_ORIGINAL_TEXT + " nested")\
+                    == TEST_ORIGINAL_TEXT + " nested"
+                assert time.perf_counter() - start < 1
+
+
+class AdmissionTest(TestCase):
+    """
+    Test input limits and admission control of encode/decode requests.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.limits = {
+            'MAX_BODY_BYTES': 1024, 'UNLIMITED_PATHS': ['/v1/encode/stream/'],
+            'MAX_TOKENS': 10, 'MAX_WORD_LIST': 5, 'MAX_REQUEST_COST': 100,
+            'MAX_COST_IN_FLIGHT': 100, 'QUEUE_TIMEOUT': 0, 'RETRY_AFTER': 3,
+        }
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("one") == 1
+        assert estimate_tokens("one two\nthree\tfour") == 4
+        # words without whitespace are charged by length
+        assert estimate_tokens(",".join(["word"] * 1200)) ==\
+            estimate_tokens(" ".join(["word"] * 1200))
+        assert decode_cost("one two", 2, encodes=2) == 3 * 2 + 2
+        # permutation of the longest word and hints are charged too
+        assert encode_cost("one three", hints=True) == 2 + 5
+        assert request_decode_cost({"encoded_text": "one three", "hints": "AAAA", "digest": ""})\
+            == 2 + 5 + 4
+
+    def test_too_large_rejected(self):
+        with self.settings(ALLOWED_HOSTS=['testserver'], WEIRDTEXT_LIMITS=self.limits):
+            response = self.client.post("/v1/encode/",\
+                json.dumps({"original_text": "x" * 2048}), content_type="application/json")
+            assert response.status_code == 413
+            response = self.client.post("/v1/encode/",\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT}), content_type="application/json")
+            assert response.status_code == 413
+            response = self.client.post("/v1/decode/", json.dumps({
+                "encoded_text": "", "word_list": ["a"] * 6, "original_text": "a"
+            }), content_type="application/json")
+            assert response.status_code == 413
+            response = self.client.post("/v1/encode/stream/", "x " * 2048,\
+                content_type="text/plain")
+            assert response.status_code == 200
+
+            response = self.client.post("/v1/encode/batch/", json.dumps({"items": [
+                {"original_text": TEST_ORIGINAL_TEXT}, {"original_text": "short text"}
+            ]}), content_type="application/json")
+            assert response.status_code == 200
+            assert response.json()['results'][0] == {"error": 413}
+            assert response.json()['results'][1]['word_list'] == ["short", "text"]
+
+    def test_busy_rejected(self):
+        with self.settings(ALLOWED_HOSTS=['testserver'], WEIRDTEXT_LIMITS=self.limits):
+            with admission.admit(99):
+                for path in ("/v1/encode/", "/v1/async/encode/"):
+                    response = self.client.post(path,\
+                        json.dumps({"original_text": "short text"}),\
+                        content_type="application/json")
+                    assert response.status_code == 429
+                    assert response['Retry-After'] == "3"
+            assert admission.cost_in_flight == 0
+            response = self.client.post("/v1/encode/",\
+                json.dumps({"original_text": "short text"}), content_type="application/json")
+            assert response.status_code == 200
+
+
+class ApiWireFormatTest(TestCase):
+    """
+    Test binary formats, compressed bodies and run-length encoded word list.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.encoded_text, self.word_list = weirdtext_encoder(TEST_ORIGINAL_TEXT)
+
+    def test_word_runs(self):
+        word_list = ["and", "big", "big", "Big", "big", "test"]
+        assert word_runs(word_list) == [["and", 1], ["big", 2], ["Big", 1], ["big", 1], ["test", 1]]
+        assert expand_word_runs(word_runs(word_list)) == word_list
+        assert word_runs([]) == []
+
+    def test_compressed_bodies(self):
+        data = {"original_text": TEST_ORIGINAL_TEXT * 10, "word_runs": True}
+        with self.settings(ALLOWED_HOSTS=['testserver']):
+            response = self.client.post("/v1/encode/", gzip.compress(json.dumps(data).encode()),\
+                content_type="application/json", HTTP_CONTENT_ENCODING="gzip",\
+                HTTP_ACCEPT_ENCODING="gzip")
+            assert response.status_code == 200
+            assert response['Content-Encoding'] == "gzip"
+            assert response['ETag'].startswith('W/"')
+            encoded = json.loads(gzip.decompress(response.content))
+            assert expand_word_runs(encoded['word_runs']) ==\
+                weirdtext_encoder(TEST_ORIGINAL_TEXT * 10)[1]
+
+            response = self.client.post("/v1/decode/", json.dumps({
+                "encoded_text": encoded['encoded_text'], "word_runs": encoded['word_runs'],
+                "original_text": TEST_ORIGINAL_TEXT * 10, "digest": encoded['digest'],
+            }), content_type="application/json")
+            assert response.status_code == 200
+            assert response.json() == {"decoded_text": TEST_ORIGINAL_TEXT * 10}
+
+            response = self.client.post("/v1/encode/", b"not gzip",\
+                content_type="application/json", HTTP_CONTENT_ENCODING="gzip")
+            assert response.status_code == 400
+            response = self.client.post("/v1/encode/", b"{}",\
+                content_type="application/json", HTTP_CONTENT_ENCODING="br")
+            assert response.status_code == 415
+            response = self.client.post("/v1/encode/stream/",\
+                gzip.compress(TEST_ORIGINAL_TEXT.encode()), content_type="text/plain",\
+                HTTP_CONTENT_ENCODING="gzip")
+            data = json.loads(b"".join(response.streaming_content))
+            assert (data['encoded_text'], data['word_list']) == (self.encoded_text, self.word_list)
+
+    def test_decompressed_too_large(self):
+        limits = dict(settings.WEIRDTEXT_LIMITS, MAX_BODY_BYTES=1024)
+        body = gzip.compress(json.dumps({"original_text": "x " * 1024}).encode())
+        with self.settings(ALLOWED_HOSTS=['testserver'], WEIRDTEXT_LIMITS=limits):
+            response = self.client.post("/v1/encode/", body,\
+                content_type="application/json", HTTP_CONTENT_ENCODING="gzip")
+            assert response.status_code == 413
+
+    def test_hints(self):
+        with self.settings(ALLOWED_HOSTS=['testserver']):
+            response = self.client.post("/v1/encode/",\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT, "hints": True}),\
+                content_type="application/json")
+            assert response.status_code == 200
+            encoded = response.json()
+            assert 'word_list' not in encoded
+            assert encoded['encoded_text'] == self.encoded_text
+
+            response = self.client.post("/v1/decode/", json.dumps(encoded),\
+                content_type="application/json")
+            assert response.status_code == 200
+            assert response.json() == {"decoded_text": TEST_ORIGINAL_TEXT}
+            response = self.client.post("/v1/decode/batch/", json.dumps({"items": [
+                encoded, dict(encoded, digest="0" * 64), {"hints": encoded['hints']},
+                {"encoded_text": encoded['encoded_text'], "hints": encoded['hints']},
+            ]}), content_type="application/json")
+            assert response.json()['results'] == [{"decoded_text": TEST_ORIGINAL_TEXT},\
+                {"error": 400}, {"error": 422}, {"error": 422}]
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        body = msgpack.packb({"original_text": TEST_ORIGINAL_TEXT})
+        with self.settings(ALLOWED_HOSTS=['testserver']):
+            response = self.client.post("/v1/encode/", body, content_type="application/msgpack",\
+                HTTP_ACCEPT="application/msgpack")
+            assert response.status_code == 200
+            assert response['Content-Type'] == "application/msgpack"
+            encoded = msgpack.unpackb(response.content)
+            assert (encoded['encoded_text'], encoded['word_list']) ==\
+                (self.encoded_text, self.word_list)
+            json_response = self.client.post("/v1/encode/",\
+                json.dumps({"original_text": TEST_ORIGINAL_TEXT}), content_type="application/json")
+            assert json_response['ETag'] != response['ETag']
+
+            response = self.client.post("/v1/decode/",\
+                msgpack.packb(dict(encoded, original_text=TEST_ORIGINAL_TEXT)),\
+                content_type="application/msgpack", HTTP_ACCEPT="application/msgpack")
+            assert msgpack.unpackb(response.content) == {"decoded_text": TEST_ORIGINAL_TEXT}
+
+
+class DocumentStoreTest(TestCase):
+    """
+    Test if stored encoding is decoded by id and old documents are evicted.
+    """
+    def setUp(self):
+        self.client = Client()
+
+    def encode(self, original_text):
+        response = self.client.post("/v1/encode/",\
+            json.dumps({"original_text": original_text, "store": True}),\
+            content_type="application/json")
+        assert response.status_code == 200
+        assert 'ETag' not in response
+        return response.json()['document_id']
+
+    def test_decode_document(self):
+        with self.settings(ALLOWED_HOSTS=['testserver']):
+            document_id = self.encode(TEST_ORIGINAL_TEXT)
+            assert self.encode(TEST_ORIGINAL_TEXT) == document_id
+            assert EncodedDocument.objects.count() == 1
+            document = EncodedDocument.objects.get(id=document_id)
+            assert (document.encoded_text, document.word_list) ==\
+                weirdtext_encoder(TEST_ORIGINAL_TEXT)
+
+            response = self.client.get(f"/v1/decode/{document_id}/")
+            assert response.status_code == 200
+            assert response.json() == {"decoded_text": TEST_ORIGINAL_TEXT}
+            response = self.client.get(f"/v1/decode/{'0' * 64}/")
+            assert response.status_code == 404
+
+            empty_id = self.encode("")
+            assert self.client.get(f"/v1/decode/{empty_id}/").json() == {"decoded_text": ""}
+
+    def test_eviction(self):
+        config = {'RETENTION': 3600, 'MAX_DOCUMENTS': 2}
+        with self.settings(ALLOWED_HOSTS=['testserver'], WEIRDTEXT_DOCUMENTS=config):
+            first_id, second_id = self.encode("first text"), self.encode("second text")
+            self.client.get(f"/v1/decode/{first_id}/")
+            self.encode("third text")
+            assert set(EncodedDocument.objects.values_list('id', flat=True)) ==\
+                {first_id, EncodedDocument.make_id("third text", "bounded")}
+            assert second_id not in EncodedDocument.objects.values_list('id', flat=True)
+
+            EncodedDocument.objects.update(used_at=timezone.now() - timedelta(hours=2))
+            self.encode("fourth text")
+            assert EncodedDocument.objects.count() == 1
+
+    def test_batch_evicts_once(self):
+        config = {'RETENTION': 3600, 'MAX_DOCUMENTS': 2}
+        items = [{"original_text": f"text {i}", "store": True} for i in range(4)]
+        with self.settings(ALLOWED_HOSTS=['testserver'], WEIRDTEXT_DOCUMENTS=config),\
+            mock.patch.object(EncodedDocument.objects, 'evict',\
+                wraps=EncodedDocument.objects.evict) as evict:
+            response = self.client.post("/v1/encode/batch/", json.dumps({"items": items}),\
+                content_type="application/json")
+            assert response.status_code == 200
+            assert evict.call_count == 1
+            assert EncodedDocument.objects.count() == 2
+
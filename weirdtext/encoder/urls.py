@@ -1,8 +1,20 @@
-from django.urls import path
+from django.urls import path, re_path
 
-from .views import EncodeApi, DecodeApi
+from .async_views import encode_view as async_encode_view, decode_view as async_decode_view
+from .fast_views import encode_view as fast_encode_view, decode_view as fast_decode_view
+from .views import EncodeApi, DecodeApi, EncodeBatchApi, DecodeBatchApi, EncodeStreamApi,\
+    DecodeDocumentApi, EncodeIncrementalApi
 
 urlpatterns = [
     path('encode/', EncodeApi.as_view()),
     path('decode/', DecodeApi.as_view()),
+    path('encode/batch/', EncodeBatchApi.as_view()),
+    path('decode/batch/', DecodeBatchApi.as_view()),
+    re_path(r'^decode/(?P<document_id>[0-9a-f]{64})/$', DecodeDocumentApi.as_view()),
+    path('encode/stream/', EncodeStreamApi.as_view()),
+    path('encode/incremental/', EncodeIncrementalApi.as_view()),
+    path('async/encode/', async_encode_view),
+    path('async/decode/', async_decode_view),
+    path('fast/encode/', fast_encode_view),
+    path('fast/decode/', fast_decode_view),
 ]
@@ -1,11 +1,250 @@
+import codecs
+import hmac
+import json
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from swagger.swagger import enccode_request_body, decode_request_body
+from swagger.swagger import enccode_request_body, decode_request_body, reencode_request_body,\
+    encode_batch_request_body, decode_batch_request_body, encode_query_parameters
+
+from . import metrics
+from .admission import admission, encode_cost, decode_cost, Rejected
+from .archive import SpilledWordList
+from .bulk import encoded_result
+from .cache import cached_encode, cached_decode, result_key
+from .formats import API_PARSER_CLASSES, API_RENDERER_CLASSES
+from .models import EncodedDocument
+from .singleflight import SingleFlight
+from .encoder import expand_word_runs, weirdtext_hint_decoder, iter_decode,\
+    weirdtext_digest, weirdtext_reencode,\
+    weirdtext_encode_batch, weirdtext_decode_batch, iter_encode, SHUFFLE_BOUNDED, SHUFFLE_MODES,\
+    DECODER_FALLBACK_MODES
+
+
+def validate_encode_data(data):
+    """Return error status for incorrect encode parameters, None if they are correct."""
+    if not "original_text" in data.keys():
+        return status.HTTP_422_UNPROCESSABLE_ENTITY
+    if not isinstance(data['original_text'], str)\
+        or data.get('mode', SHUFFLE_BOUNDED) not in SHUFFLE_MODES\
+        or not isinstance(data.get('parallel', False), bool)\
+        or not isinstance(data.get('word_runs', False), bool)\
+        or not isinstance(data.get('hints', False), bool)\
+        or not isinstance(data.get('store', False), bool):
+        return status.HTTP_400_BAD_REQUEST
+    return None
+
+
+def valid_word_runs(runs):
+    """Check if runs is a list of `[word, count]` pairs."""
+    return isinstance(runs, list) and all(
+        isinstance(run, list) and len(run) == 2 and isinstance(run[0], str)\
+            and isinstance(run[1], int) and run[1] > 0 for run in runs
+    )
+
+
+def validate_decode_data(data):
+    """
+    Return error status for incorrect decode parameters, None if they are correct.
+    Word list is given as `word_list` or run-length encoded `word_runs`,
+    with `hints` only encoded text and digest of the hints are needed.
+    """
+    if "hints" in data.keys():
+        if any(x not in data.keys() for x in ("encoded_text", "digest")):
+            return status.HTTP_422_UNPROCESSABLE_ENTITY
+        if not isinstance(data['encoded_text'], str)\
+            or not isinstance(data['hints'], str)\
+            or not isinstance(data['digest'], str):
+            return status.HTTP_400_BAD_REQUEST
+        return None
+    if any(x not in data.keys() for x in ("encoded_text", "original_text"))\
+        or "word_list" not in data.keys() and "word_runs" not in data.keys():
+        return status.HTTP_422_UNPROCESSABLE_ENTITY
+    if not isinstance(data['encoded_text'], str)\
+        or not isinstance(data.get('word_list', []), list)\
+        or "word_list" not in data.keys() and not valid_word_runs(data['word_runs'])\
+        or not isinstance(data['original_text'], str)\
+        or not isinstance(data.get('digest', ""), str)\
+        or data.get('mode', SHUFFLE_BOUNDED) not in SHUFFLE_MODES:
+        return status.HTTP_400_BAD_REQUEST
+    return None
+
+
+def item_cost(cost_function, *args):
+    """Return cost of batch item or Rejected exception if it's over the limits."""
+    try:
+        return cost_function(*args)
+    except Rejected as exc:
+        return exc
+
+
+def validate_reencode_data(data):
+    """Return error status for incorrect re-encode parameters, None if they are correct."""
+    if any(x not in data.keys() for x in\
+        ("original_text", "encoded_text", "word_list", "digest", "edits")):
+        return status.HTTP_422_UNPROCESSABLE_ENTITY
+    if not isinstance(data['original_text'], str)\
+        or not isinstance(data['encoded_text'], str)\
+        or not isinstance(data['word_list'], list)\
+        or not all(isinstance(word, str) for word in data['word_list'])\
+        or not isinstance(data['digest'], str)\
+        or not isinstance(data['edits'], list)\
+        or not all(isinstance(edit, dict) and isinstance(edit.get('start'), int)\
+            and isinstance(edit.get('end'), int) and isinstance(edit.get('text'), str)\
+            for edit in data['edits']):
+        return status.HTTP_400_BAD_REQUEST
+    return None
+
+
+def validate_batch_data(data):
+    """
+    Return error status for incorrect batch parameters, None if they are correct.
+    Items are validated one by one later.
+    """
+    if not "items" in data.keys():
+        return status.HTTP_422_UNPROCESSABLE_ENTITY
+    if not isinstance(data['items'], list):
+        return status.HTTP_400_BAD_REQUEST
+    if len(data['items']) > settings.WEIRDTEXT_BATCH_MAX_ITEMS:
+        return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    return None
+
+
+def request_decode_cost(data):
+    """
+    Return estimated cost of correct decode parameters, without expanding word runs.
+    Raises TooExpensive when it's over the limits.
+    """
+    if "hints" in data.keys():
+        return encode_cost(data['encoded_text'], hints=True) + len(data['hints'])
+    word_count = len(data['word_list']) if "word_list" in data.keys()\
+        else sum(count for _, count in data['word_runs'])
+    # original text is encoded again without digest, in every fallback mode without mode
+    encodes = 0 if "digest" in data.keys()\
+        else 1 if "mode" in data.keys() else len(DECODER_FALLBACK_MODES)
+    return decode_cost(data['original_text'], word_count, encodes)
+
+
+def request_word_list(data):
+    """Return word list of correct decode parameters."""
+    if "word_list" in data.keys():
+        return data['word_list']
+    return expand_word_runs(data['word_runs'])
+
+
+def encoded_data(encoded_text, word_list, original_text, runs=False, hints=False):
+    """Return data of encode response, see `encoded_result`."""
+    return encoded_result(encoded_text, word_list, original_text, settings.WEIRDTEXT_DIGEST_KEY,\
+        runs, hints)
+
+
+single_flight = SingleFlight()
+
+DECODE_PARAMETERS = ("encoded_text", "hints", "word_list", "word_runs", "original_text", "digest",\
+    "mode")
+
+
+def encode_flight_key(original_text, mode, runs=False, hints=False, store=False):
+    """Return key of encode call, identical requests have the same key."""
+    return result_key('encode-result', mode, original_text, str(runs), str(hints), str(store))
+
+
+def decode_flight_key(data):
+    """Return key of decode call for correct parameters, identical requests have the same key."""
+    return result_key('decode-result', [name for name in DECODE_PARAMETERS if name in data],\
+        *(data.get(name, "") for name in DECODE_PARAMETERS))
+
+
+def admitted(cost, timeout, function, *args):
+    """Return `function(*args)` called when admission control admits cost."""
+    with admission.admit(cost, timeout):
+        return function(*args)
+
+
+def coalesced(key, cost, function, *args):
+    """
+    Return `function(*args)` called with admitted cost (raises Rejected).
+    When WEIRDTEXT_SINGLE_FLIGHT is enabled, concurrent calls with the same key
+    wait for the running call and share its result (or exception) instead,
+    without reserving admission capacity.
+    """
+    if settings.WEIRDTEXT_SINGLE_FLIGHT['ENABLED']:
+        return single_flight.do(key, admitted, cost, None, function, *args)
+    return admitted(cost, None, function, *args)
+
+
+def encode_result(original_text, mode=SHUFFLE_BOUNDED, workers=1, runs=False, hints=False,\
+    store=False):
+    """
+    Return data of encode response for correct parameters.
+    With store the result is saved as EncodedDocument and its `document_id` is added.
+    """
+    encoded_text, word_list = cached_encode(original_text, mode=mode, workers=workers)
+    data = encoded_data(encoded_text, word_list, original_text, runs, hints)
+    if store:
+        data['document_id'] = EncodedDocument.objects.store(original_text, mode, encoded_text,\
+            word_list).id
+    return data
+
+
+def hints_decode_result(data):
+    """
+    Return data of decode response for correct parameters with hints.
+    Raises ValueError for incorrect encoded text or hints.
+    """
+    return {
+        "decoded_text": weirdtext_hint_decoder(data['encoded_text'], data['hints'],\
+            data['digest'], settings.WEIRDTEXT_DIGEST_KEY),
+    }
+
+
+def hints_decoded_text(data):
+    """Return decoded text for correct parameters with hints, None for incorrect hints."""
+    try:
+        return hints_decode_result(data)['decoded_text']
+    except ValueError:
+        return None
+
+
+def decode_result(data):
+    """
+    Return data of decode response for correct parameters.
+    Raises ValueError for incorrect encoded text.
+    """
+    if "hints" in data.keys():
+        return hints_decode_result(data)
+    decoded_text = cached_decode(data['encoded_text'], request_word_list(data),\
+        data['original_text'], digest=data.get('digest'), key=settings.WEIRDTEXT_DIGEST_KEY,\
+        mode=data.get('mode'))
+    return {
+        "decoded_text": decoded_text,
+    }
+
 
-from .encoder import weirdtext_encoder, weirdtext_decoder
+def encode_etag(original_text, mode, *variant):
+    """
+    Return strong ETag of the encode response. Encoding is deterministic,
+    so the tag is made of the request content only. Variant is a list of
+    non-default representation options (response format, `word_runs`).
+    """
+    return '"%s"' % result_key('encode-etag', mode, original_text,\
+        settings.WEIRDTEXT_DIGEST_KEY.hex(), *variant).rsplit(':', 1)[1]
+
+
+def etag_matches(request, etag):
+    """
+    Check if `If-None-Match` request header matches given ETag.
+    Weak comparison is used, compressed responses have weak ETags.
+    """
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in etags)
 
 
 class EncodeApi(APIView):
@@ -13,38 +252,106 @@ class EncodeApi(APIView):
     Encode the given message.
     Parameters:
         :original_text - text to encode
+        :mode - optional shuffle mode, `bounded` (default), `legacy` or `local`
+            (every word shuffled independently, see `/v1/encode/incremental/`)
+        :parallel - optional, encode large text in process pool
+            (WEIRDTEXT_ENCODER_WORKERS processes), result is the same
+        :word_runs - optional, return run-length encoded `word_runs` instead of `word_list`
+        :hints - optional, return permutation `hints` instead of `word_list`, with them
+            decode needs only encoded text and is much faster
+        :store - optional, save the result on the server, it can be decoded
+            with `GET /v1/decode/<document_id>/` (response has no ETag then)
     Return
         :encoded_text - encoded text message
         :word_list - sorted list of original words, contains only words which were shuffled
+        :word_runs - `[[word, count], ...]` runs of word list, when requested
+        :hints - base64 of varint packed permutation digits of shuffled words, when requested
+        :document_id - id of saved result, when requested
+        :digest - integrity digest of the result, lets decode skip encoding again
     Example:
         POST /v1/encode/
         {
         "original_text": "This is a long looong test sentence,
         with some big (biiiiig) words!"
         }
+
+    Responses have strong ETag made of the request content, when `If-None-Match`
+    header of GET request matches it, 304 is returned without encoding the text.
+    Identical concurrent requests are encoded once and share the result
+    (WEIRDTEXT_SINGLE_FLIGHT, also across worker processes with LOCK_DIRECTORY).
+    The same encoding is available with GET (`original_text` and `mode` as query
+    parameters), which is cacheable (Cache-Control max-age), e.g. by nginx proxy:
+        GET /v1/encode/?original_text=This%20is%20a%20long%20test
+
+    Besides JSON, request and response bodies can be MessagePack (`application/msgpack`)
+    or CBOR (`application/cbor`), selected by Content-Type and Accept headers,
+    and compressed with gzip or zstd (Content-Encoding, Accept-Encoding).
     """
+    parser_classes = API_PARSER_CLASSES
+    renderer_classes = API_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        responses={
+            422: 'missing data parameters',
+            400: 'incorrect data',
+            304: 'not modified, ETag matches `If-None-Match`',
+            413: 'request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
+            200: 'encoded text message and sorted list of original words'
+        },
+        manual_parameters=encode_query_parameters,
+    )
+    def get(self, request):
+        data = {key: request.query_params[key] for key in ("original_text", "mode")\
+            if key in request.query_params}
+        response = self.encode(request, data)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            patch_cache_control(response, public=True,\
+                max_age=settings.WEIRDTEXT_ENCODE_CACHE_MAX_AGE)
+            patch_vary_headers(response, ('Accept',))
+        return response
+
     @swagger_auto_schema(
         responses={
             422: 'missing data parameters',
             400: 'incorrect data',
+            413: 'request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
             201: 'encoded text message and sorted list of original words'
         },
         request_body=enccode_request_body,
     )
     def post(self, request):
-        if not "original_text" in request.data.keys():
-            return Response(status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-        if not isinstance(request.data['original_text'], str):
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        with metrics.phase("request.parse"):
+            data = request.data
+        return self.encode(request, data)
 
-        encoded_text, word_list = weirdtext_encoder(request.data['original_text'])
-        return Response(
-            data={
-                "encoded_text": encoded_text,
-                "word_list": word_list,
-            }
-        )
+    def encode(self, request, data):
+        error_status = validate_encode_data(data)
+        if error_status is not None:
+            return Response(status=error_status)
+
+        original_text = data['original_text']
+        mode = data.get('mode', SHUFFLE_BOUNDED)
+        runs = data.get('word_runs', False)
+        hints = data.get('hints', False)
+        variant = [request.accepted_renderer.format] if request.accepted_renderer.format != 'json'\
+            else []
+        variant += [option for option in ('word_runs', 'hints') if data.get(option)]
+        etag = encode_etag(original_text, mode, *variant)
+        store = data.get('store', False)
+        # saved document can be evicted, so stored result is always returned;
+        # only safe methods get 304 (RFC 9110 13.1.2), POST always gets the body
+        if not store and request.method in ("GET", "HEAD") and etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
+        workers = settings.WEIRDTEXT_ENCODER_WORKERS if data.get('parallel') else 1
+        try:
+            return Response(data=coalesced(encode_flight_key(original_text, mode, runs, hints,\
+                store), encode_cost(original_text, hints), encode_result, original_text, mode,\
+                workers, runs, hints, store), headers={} if store else {"ETag": etag})
+        except Rejected as exc:
+            return Response(status=exc.status, headers=exc.headers)
 
 
 class DecodeApi(APIView):
@@ -53,7 +360,13 @@ class DecodeApi(APIView):
     Parameters:
         :encoded_text - encoded text message
         :word_list - sorted list of original words, contains only words which were shuffled
+        :word_runs - run-length encoded word list `[[word, count], ...]`, instead of word_list
         :original_text - original message to check if encoded correctly
+        :hints - permutation hints returned by encode, instead of word list and original text
+        :digest - digest returned by encode, required with hints; without it
+            original_text is encoded again to check the input
+        :mode - optional shuffle mode of encode, used to encode original_text again
+            (without it `bounded` and `legacy` are tried, `local` must be given)
     Return
         :decoded_text - decoded text message
     Example:
@@ -75,31 +388,333 @@ class DecodeApi(APIView):
             "original_text": "This is a long looong test sentence,
             with some big (biiiiig) words!"
         }
+    Formats and compression are the same as in `/v1/encode/`.
     """
+    parser_classes = API_PARSER_CLASSES
+    renderer_classes = API_RENDERER_CLASSES
+
     @swagger_auto_schema(
         responses={
             422: 'missing data parameters',
             400: 'incorrect data',
+            413: 'request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
             201: 'decoded text message'
         },
         request_body=decode_request_body
     )
     def post(self, request):
-        if any(x not in request.data.keys()\
-            for x in ("encoded_text", "word_list", "original_text")):
-            return Response(status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-        if not isinstance(request.data['encoded_text'], str)\
-            or not isinstance(request.data['word_list'], list)\
-            or not isinstance(request.data['original_text'], str):
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        with metrics.phase("request.parse"):
+            data = request.data
+        error_status = validate_decode_data(data)
+        if error_status is not None:
+            return Response(status=error_status)
 
         try:
-            decoded_text = weirdtext_decoder(request.data['encoded_text'],\
-                request.data['word_list'], request.data['original_text'])
-            return Response(
-                data={
-                    "decoded_text": decoded_text,
-                }
-            )
+            return Response(data=coalesced(decode_flight_key(data), request_decode_cost(data),\
+                decode_result, data))
+        except Rejected as exc:
+            return Response(status=exc.status, headers=exc.headers)
         except ValueError:
             return Response("Incorrect encoded text", status=status.HTTP_400_BAD_REQUEST)
+
+
+class DecodeDocumentApi(APIView):
+    """
+    Decode the message saved by `/v1/encode/` with `store` option.
+    Saved data comes from the encoder, so it isn't checked again.
+    Return
+        :decoded_text - decoded text message
+    Example:
+        GET /v1/decode/3f0c...9a1e/
+    """
+    renderer_classes = API_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        responses={
+            404: 'document not found, e.g. evicted',
+            413: 'request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
+            200: 'decoded text message'
+        },
+    )
+    def get(self, request, document_id):
+        try:
+            document = EncodedDocument.objects.get(id=document_id)
+        except EncodedDocument.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            with admission.admit(encode_cost(document.encoded_text) + document.word_count):
+                document.touch()
+                return Response(data={
+                    "decoded_text": "".join(iter_decode([document.encoded_text],\
+                        document.word_list)),
+                })
+        except Rejected as exc:
+            return Response(status=exc.status, headers=exc.headers)
+
+
+class EncodeIncrementalApi(APIView):
+    """
+    Update encoding of edited text, only edited words are encoded again.
+    Previous encoding must be made in `local` mode, where shuffle of every word
+    doesn't depend on the rest of the text.
+    Parameters:
+        :original_text - previous original text
+        :encoded_text, word_list, digest - previous result of `/v1/encode/`
+        :edits - list of `{"start", "end", "text"}` replacing `original_text[start:end]`
+            with text, sorted and not overlapping (positions in previous original text)
+    Return
+        the same as `/v1/encode/` in `local` mode for edited original text
+    Example:
+        POST /v1/encode/incremental/
+        {
+            "original_text": "This is a long test",
+            "encoded_text": "...",
+            "word_list": [...],
+            "digest": "...",
+            "edits": [{"start": 10, "end": 14, "text": "short"}]
+        }
+    """
+    parser_classes = API_PARSER_CLASSES
+    renderer_classes = API_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        responses={
+            422: 'missing data parameters',
+            400: 'incorrect data, previous encoding or edits',
+            413: 'request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
+            200: 'encoded edited text message and sorted list of original words'
+        },
+        request_body=reencode_request_body,
+    )
+    def post(self, request):
+        data = request.data
+        error_status = validate_reencode_data(data)
+        if error_status is not None:
+            return Response(status=error_status)
+
+        key = settings.WEIRDTEXT_DIGEST_KEY
+        expected = weirdtext_digest(data['encoded_text'], data['word_list'],\
+            data['original_text'], key)
+        if not hmac.compare_digest(data['digest'].encode(), expected.encode()):
+            return Response("Incorrect encoded text", status=status.HTTP_400_BAD_REQUEST)
+
+        edits = [(edit['start'], edit['end'], edit['text']) for edit in data['edits']]
+        try:
+            with admission.admit(encode_cost(" ".join(text for _, _, text in edits))):
+                original_text, encoded_text, word_list = weirdtext_reencode(\
+                    data['original_text'], data['encoded_text'], data['word_list'], edits)
+        except Rejected as exc:
+            return Response(status=exc.status, headers=exc.headers)
+        except ValueError as exc:
+            return Response(str(exc), status=status.HTTP_400_BAD_REQUEST)
+        return Response(data=encoded_data(encoded_text, word_list, original_text))
+
+
+class EncodeBatchApi(APIView):
+    """
+    Encode many messages in one request.
+    Parameters:
+        :items - list of objects with the same parameters as `/v1/encode/`
+    Return
+        :results - list with result of `/v1/encode/` for every item in the same order,
+            or `{"error": status}` for incorrect item
+    Example:
+        POST /v1/encode/batch/
+        {
+            "items": [
+                {"original_text": "This is a long looong test sentence"},
+                {"original_text": "with some big (biiiiig) words!"}
+            ]
+        }
+    """
+    parser_classes = API_PARSER_CLASSES
+    renderer_classes = API_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        responses={
+            422: 'missing data parameters',
+            400: 'incorrect data',
+            413: 'too many items or request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
+            200: 'results for every item'
+        },
+        request_body=encode_batch_request_body,
+    )
+    def post(self, request):
+        error_status = validate_batch_data(request.data)
+        if error_status is not None:
+            return Response(status=error_status)
+
+        items = request.data['items']
+        errors = [validate_encode_data(item) if isinstance(item, dict)\
+            else status.HTTP_400_BAD_REQUEST for item in items]
+        costs = [item_cost(encode_cost, item['original_text'], item.get('hints', False))\
+            if error is None else 0 for item, error in zip(items, errors)]
+        errors = [cost.status if isinstance(cost, Rejected) else error\
+            for error, cost in zip(errors, costs)]
+        correct_items = [item for item, error in zip(items, errors) if error is None]
+        try:
+            with admission.admit(sum(cost for cost in costs if isinstance(cost, int))):
+                encoded = iter(weirdtext_encode_batch(
+                    ((item['original_text'], item.get('mode', SHUFFLE_BOUNDED))\
+                        for item in correct_items),
+                    encoder=cached_encode,
+                ))
+        except Rejected as exc:
+            return Response(status=exc.status, headers=exc.headers)
+
+        results = []
+        for item, error in zip(items, errors):
+            if error is not None:
+                results.append({"error": error})
+                continue
+            encoded_text, word_list = next(encoded)
+            results.append(encoded_data(encoded_text, word_list, item['original_text'],\
+                item.get('word_runs', False), item.get('hints', False)))
+            if item.get('store', False):
+                results[-1]['document_id'] = EncodedDocument.objects.store(item['original_text'],\
+                    item.get('mode', SHUFFLE_BOUNDED), encoded_text, word_list, evict=False).id
+        if any(item.get('store', False) for item in correct_items):
+            EncodedDocument.objects.evict()
+        return Response(data={"results": results})
+
+
+class DecodeBatchApi(APIView):
+    """
+    Decode many messages in one request.
+    Parameters:
+        :items - list of objects with the same parameters as `/v1/decode/`
+    Return
+        :results - list with result of `/v1/decode/` for every item in the same order,
+            or `{"error": status}` for incorrect item
+    Example:
+        POST /v1/decode/batch/
+        {
+            "items": [
+                {
+                    "encoded_text": "--weird--\nTihs is a lnog tset--weird--",
+                    "word_list": ["long", "test", "This"],
+                    "original_text": "This is a long test"
+                }
+            ]
+        }
+    """
+    parser_classes = API_PARSER_CLASSES
+    renderer_classes = API_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        responses={
+            422: 'missing data parameters',
+            400: 'incorrect data',
+            413: 'too many items or request too expensive',
+            429: 'server busy, retry after `Retry-After` seconds',
+            200: 'results for every item'
+        },
+        request_body=decode_batch_request_body,
+    )
+    def post(self, request):
+        error_status = validate_batch_data(request.data)
+        if error_status is not None:
+            return Response(status=error_status)
+
+        items = request.data['items']
+        errors = [validate_decode_data(item) if isinstance(item, dict)\
+            else status.HTTP_400_BAD_REQUEST for item in items]
+        costs = [item_cost(request_decode_cost, item) if error is None else 0\
+            for item, error in zip(items, errors)]
+        errors = [cost.status if isinstance(cost, Rejected) else error\
+            for error, cost in zip(errors, costs)]
+        try:
+            with admission.admit(sum(cost for cost in costs if isinstance(cost, int))):
+                decoded = iter(weirdtext_decode_batch(
+                    ((item['encoded_text'], request_word_list(item), item['original_text'],\
+                        item.get('digest'), item.get('mode')) for item, error in zip(items, errors)\
+                        if error is None and "hints" not in item.keys()),
+                    key=settings.WEIRDTEXT_DIGEST_KEY, decoder=cached_decode,
+                ))
+                hinted = iter([hints_decoded_text(item) for item, error in zip(items, errors)\
+                    if error is None and "hints" in item.keys()])
+        except Rejected as exc:
+            return Response(status=exc.status, headers=exc.headers)
+
+        results = []
+        for item, error in zip(items, errors):
+            if error is None:
+                decoded_text = next(hinted if "hints" in item.keys() else decoded)
+                if decoded_text is not None:
+                    results.append({"decoded_text": decoded_text})
+                    continue
+                error = status.HTTP_400_BAD_REQUEST
+            results.append({"error": error})
+        return Response(data={"results": results})
+
+
+def iter_request_text(request):
+    """Read request body block by block and decode it as UTF-8 on the fly."""
+    blocks = iter(lambda: request.read(settings.WEIRDTEXT_STREAM_BLOCK_SIZE), b"")
+    return codecs.iterdecode(blocks, "utf-8", errors="replace")
+
+
+def iter_encode_json(chunks, mode):
+    """
+    Yield JSON object with `encoded_text` and `word_list` piece by piece.
+    Encoded text is written as it's produced, word list at the end.
+    Words over WEIRDTEXT_STREAM_MEMORY_BUDGET are spilled to temporary files.
+    """
+    with SpilledWordList(settings.WEIRDTEXT_STREAM_MEMORY_BUDGET) as words:
+        yield '{"encoded_text": "'
+        for piece in iter_encode(chunks, words, mode=mode):
+            yield json.dumps(piece, ensure_ascii=False)[1:-1]
+        yield '", "word_list": ['
+        for index, word in enumerate(words.sorted_words()):
+            yield (", " if index else "") + json.dumps(word, ensure_ascii=False)
+        yield ']}'
+
+
+class EncodeStreamApi(APIView):
+    """
+    Encode the message sent as raw UTF-8 request body, for very large texts.
+    Request body is read and encoded block by block and the response is streamed,
+    so memory doesn't grow with the size of the text. Word list is kept in memory
+    up to WEIRDTEXT_STREAM_MEMORY_BUDGET, the rest is sorted on disk.
+    Invalid UTF-8 sequences are replaced with U+FFFD.
+    Parameters:
+        :mode - optional query parameter, shuffle mode like in `/v1/encode/`
+    Return
+        :encoded_text - encoded text message
+        :word_list - sorted list of original words, contains only words which were shuffled
+    Example:
+        POST /v1/encode/stream/?mode=bounded
+        Content-Type: text/plain
+
+        This is a long looong test sentence, with some big (biiiiig) words!
+    """
+    @swagger_auto_schema(
+        responses={
+            400: 'incorrect mode',
+            200: 'encoded text message and sorted list of original words'
+        },
+    )
+    def post(self, request):
+        mode = request.query_params.get('mode', SHUFFLE_BOUNDED)
+        if mode not in SHUFFLE_MODES:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        return StreamingHttpResponse(
+            iter_encode_json(iter_request_text(request), mode),
+            content_type="application/json",
+        )
+
+
+def metrics_view(request):  # pylint: disable=unused-argument
+    """
+    Return collected metrics in Prometheus text exposition format.
+    Available only when WEIRDTEXT_METRICS_ENABLED setting is True.
+    """
+    if not metrics.ENABLED:
+        raise Http404("Metrics are disabled.")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,8 +1,16 @@
-
 #!/bin/bash
 
+# WEIRDTEXT_SERVER=asgi runs uvicorn workers serving async views (/v1/async/)
+if [ "$WEIRDTEXT_SERVER" = "asgi" ]; then
+    exec gunicorn weirdtext.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8001
+fi
+
 python manage.py collectstatic --no-input
 
+# OpenAPI schema is generated once per deploy and served by nginx from static volume
+mkdir -p /static/swagger
+python manage.py generate_swagger /static/swagger/swagger.json --overwrite
+
 python manage.py migrate --no-input
 
 gunicorn weirdtext.wsgi:application --bind 0.0.0.0:8000
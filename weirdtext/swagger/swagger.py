@@ -1,30 +1,110 @@
-from drf_yasg.openapi import Info, Schema, Items, TYPE_OBJECT, TYPE_STRING, TYPE_ARRAY
+from drf_yasg.openapi import Info, Schema, Items, Parameter, TYPE_OBJECT, TYPE_STRING,\
+   TYPE_ARRAY, TYPE_BOOLEAN, IN_QUERY
 from drf_yasg.views import get_schema_view
 
 
+# also SWAGGER_SETTINGS['DEFAULT_INFO'] of `generate_swagger` command
+api_info = Info(
+   title="Weirdtext API",
+   default_version='v1',
+)
+
+def untyped_schema(description):
+   """
+   Return schema of value of any type. Swagger 2 allows schema without `type`,
+   but drf-yasg constructs only typed ones.
+   """
+   schema = Schema(type=TYPE_STRING, description=description)
+   del schema['type']
+   return schema
+
+
+# `[word, count]`, Swagger 2 can't describe items of different types
+word_run_schema = Schema(type=TYPE_ARRAY, min_items=2, max_items=2,\
+   items=untyped_schema('word (string), then its count (integer, at least 1)'))
+
 WeridTextSchema = get_schema_view(
-   Info(
-      title="Weirdtext API",
-      default_version='v1',
-   ),
+   api_info,
    public=True,
    # empty for presentation
 )
 
 enccode_request_body = Schema(
    type=TYPE_OBJECT,
+   required=["original_text"],
    properties={
       "original_text": Schema(type=TYPE_STRING, description='text to encode'),
+      "mode": Schema(type=TYPE_STRING, enum=["bounded", "legacy", "local"], default="bounded",\
+         description='shuffle mode, `legacy` reproduces output of the first encoder version, '\
+         '`local` allows incremental re-encoding'),
+      "parallel": Schema(type=TYPE_BOOLEAN, default=False,\
+         description='encode large text in process pool, result is the same'),
+      "word_runs": Schema(type=TYPE_BOOLEAN, default=False,\
+         description='return run-length encoded `word_runs` instead of `word_list`'),
+      "hints": Schema(type=TYPE_BOOLEAN, default=False,\
+         description='return permutation `hints` instead of `word_list`, decode needs only them'),
+      "store": Schema(type=TYPE_BOOLEAN, default=False,\
+         description='save the result, response has `document_id` for `/v1/decode/<id>/`'),
    }
 )
 
+encode_query_parameters = [
+   Parameter("original_text", IN_QUERY, type=TYPE_STRING, required=True,\
+      description='text to encode'),
+   Parameter("mode", IN_QUERY, type=TYPE_STRING, enum=["bounded", "legacy", "local"],\
+      description='shuffle mode, `legacy` reproduces output of the first encoder version, '\
+         '`local` allows incremental re-encoding'),
+]
+
 decode_request_body = Schema(
    type=TYPE_OBJECT,
+   # also `original_text` and `word_list` or `word_runs`, or `hints` and `digest`
+   required=["encoded_text"],
    properties={
       "encoded_text": Schema(type=TYPE_STRING, description='encoded text message'),
       "word_list": Schema(type=TYPE_ARRAY, items=Items(type=TYPE_STRING),\
          description='sorted list of original words, contains only words which were shuffled'),
+      "word_runs": Schema(type=TYPE_ARRAY, items=word_run_schema,\
+         description='run-length encoded word list `[[word, count], ...]`, instead of `word_list`'),
       "original_text": Schema(type=TYPE_STRING,\
          description='original message to check if encoded correctly'),
+      "digest": Schema(type=TYPE_STRING,\
+         description='digest returned by encode, required with `hints`, '\
+         'otherwise optional and skips encoding original text again'),
+      "mode": Schema(type=TYPE_STRING, enum=["bounded", "legacy", "local"],\
+         description='shuffle mode of encode, original text is encoded again only in it '\
+         '(`bounded` and `legacy` are tried without it)'),
+      "hints": Schema(type=TYPE_STRING,\
+         description='permutation hints returned by encode, '\
+         'instead of word list and original text'),
+   }
+)
+
+reencode_request_body = Schema(
+   type=TYPE_OBJECT,
+   properties={
+      "original_text": Schema(type=TYPE_STRING, description='previous original text'),
+      "encoded_text": Schema(type=TYPE_STRING, description='previous encoded text, `local` mode'),
+      "word_list": Schema(type=TYPE_ARRAY, items=Items(type=TYPE_STRING),\
+         description='previous word list'),
+      "digest": Schema(type=TYPE_STRING, description='digest of previous encoding'),
+      "edits": Schema(type=TYPE_ARRAY, items=Items(type=TYPE_OBJECT),\
+         description='list of `{"start", "end", "text"}` replacements of previous original text'),
+   }
+)
+
+encode_batch_request_body = Schema(
+   type=TYPE_OBJECT,
+   properties={
+      "items": Schema(type=TYPE_ARRAY, items=enccode_request_body,\
+         description='list of `/v1/encode/` request bodies'),
+   }
+)
+
+decode_batch_request_body = Schema(
+   type=TYPE_OBJECT,
+   properties={
+      "items": Schema(type=TYPE_ARRAY, items=decode_request_body,\
+         description='list of `/v1/decode/` request bodies'),
    }
 )
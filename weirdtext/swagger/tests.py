@@ -1,3 +1,34 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+
+class SchemaTest(TestCase):
+    """
+    Test if pre-generated OpenAPI schema is the same as served by the schema view
+    and the view doesn't generate schema on every request.
+    """
+    def test_generated_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "swagger.json")
+            call_command("generate_swagger", path, stdout=io.StringIO())
+            with open(path, encoding="utf-8") as schema_file:
+                schema = json.load(schema_file)
+        assert {"/encode/", "/decode/", "/decode/{document_id}/"} <= set(schema['paths'])
+
+        cache.clear()
+        get_schema = OpenAPISchemaGenerator.get_schema
+        with self.settings(ALLOWED_HOSTS=['testserver']), mock.patch.object(\
+            OpenAPISchemaGenerator, 'get_schema', autospec=True, side_effect=get_schema) as mocked:
+            for _ in range(3):
+                response = Client().get("/doc/swagger/?format=openapi")
+                assert response.status_code == 200
+                assert json.loads(response.content)['paths'].keys() == schema['paths'].keys()
+        assert mocked.call_count == 1
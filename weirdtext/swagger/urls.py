@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import re_path
 from .swagger import WeridTextSchema
 
 
 urlpatterns = [
-    re_path(r'^swagger/$', WeridTextSchema.with_ui('swagger', cache_timeout=0)),
+    re_path(r'^swagger/$', WeridTextSchema.with_ui('swagger',\
+        cache_timeout=settings.WEIRDTEXT_SCHEMA_CACHE_TIMEOUT)),
 ]
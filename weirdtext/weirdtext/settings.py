@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'encoder.middleware.MetricsMiddleware',
+    'encoder.middleware.ProfilerMiddleware',
+    'encoder.middleware.BodySizeLimitMiddleware',
+    'encoder.middleware.CompressionMiddleware',
+    # fast path views skip the rest of the chain
+    'encoder.middleware.FastPathMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +79,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'weirdtext.wsgi.application'
+ASGI_APPLICATION = 'weirdtext.asgi.application'
 
 
 # Database
@@ -85,6 +93,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -127,7 +152,99 @@ STATIC_ROOT = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Key of the digest returned by `/v1/encode/` and checked by `/v1/decode/`
+WEIRDTEXT_DIGEST_KEY = SECRET_KEY.encode()
+
+# Maximum number of items in `/v1/encode/batch/` and `/v1/decode/batch/` requests
+WEIRDTEXT_BATCH_MAX_ITEMS = 10000
+
+# Size of request body blocks read by `/v1/encode/stream/`
+WEIRDTEXT_STREAM_BLOCK_SIZE = 64 * 1024
+# Estimated memory (bytes) of word list of `/v1/encode/stream/` request,
+# words over it are spilled to temporary files (upload size isn't limited)
+WEIRDTEXT_STREAM_MEMORY_BUDGET = 32 * 1024 * 1024
+
+# Number of processes used by parallel encoding (`"parallel": true` in `/v1/encode/`)
+WEIRDTEXT_ENCODER_WORKERS = os.cpu_count() or 1
+
+# Memoization of encode/decode results, BACKEND None disables it.
+# `encoder.cache.DjangoResultCache` stores results in CACHES, e.g.
+# {'BACKEND': 'encoder.cache.DjangoResultCache', 'OPTIONS': {'alias': 'results'}}
+WEIRDTEXT_RESULT_CACHE = {
+    'BACKEND': 'encoder.cache.LRUResultCache',
+    'OPTIONS': {
+        'max_entries': 1024,
+        'max_bytes': 64 * 1024 * 1024,
+    },
+}
+
+# Coalescing of identical concurrent encode/decode calls, see encoder/singleflight.py.
+# With LOCK_DIRECTORY also calls of other processes (gunicorn workers) wait for
+# the first one, via lock files; they need result cache shared by the processes
+# (e.g. DjangoResultCache with file-based backend), otherwise they encode again.
+WEIRDTEXT_SINGLE_FLIGHT = {
+    'ENABLED': True,
+    'LOCK_DIRECTORY': os.environ.get('WEIRDTEXT_SINGLE_FLIGHT_LOCK_DIRECTORY'),
+    'LOCK_STRIPES': 256,
+    'LOCK_TIMEOUT': 30,
+}
+
+# Cache-Control max-age (seconds) of `GET /v1/encode/` responses
+WEIRDTEXT_ENCODE_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Collect request and encoder phase metrics, exposed at `/metrics`
+WEIRDTEXT_METRICS_ENABLED = os.environ.get('WEIRDTEXT_METRICS_ENABLED') == '1'
+
+# Profiling of sampled requests (or requests with `X-Weirdtext-Profile: 1` header),
+# summarize saved profiles with `python manage.py weirdtext_profiles`
+WEIRDTEXT_PROFILER = {
+    'ENABLED': os.environ.get('WEIRDTEXT_PROFILER_ENABLED') == '1',
+    'SAMPLE_RATE': 0.001,
+    'HEADER': 'X-Weirdtext-Profile',
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'TOP': 30,
+    'MAX_FILES': 200,
+}
+
+# Executor of `/v1/async/encode/` and `/v1/async/decode/` views (served by ASGI server),
+# EXECUTOR is `thread` or `process`, requests over MAX_PENDING get 503 with Retry-After
+WEIRDTEXT_ASYNC = {
+    'EXECUTOR': 'thread',
+    'WORKERS': os.cpu_count() or 1,
+    'MAX_PENDING': 64,
+    'RETRY_AFTER': 1,
+}
+
+# prefix of fast path views without DRF (see encoder/fast_views.py),
+# FastPathMiddleware calls them directly, skipping the following middleware
+WEIRDTEXT_FAST_PATH_PREFIX = '/v1/fast/'
+
+# input limits and admission control, see encoder/admission.py
+WEIRDTEXT_LIMITS = {
+    'MAX_BODY_BYTES': 16 * 1024 * 1024,
+    'UNLIMITED_PATHS': ['/v1/encode/stream/'],
+    'MAX_TOKENS': 1_000_000,
+    'MAX_WORD_LIST': 500_000,
+    'MAX_REQUEST_COST': 2_000_000,
+    'MAX_COST_IN_FLIGHT': 4_000_000,
+    'QUEUE_TIMEOUT': 2,
+    'RETRY_AFTER': 1,
+}
+DATA_UPLOAD_MAX_MEMORY_SIZE = WEIRDTEXT_LIMITS['MAX_BODY_BYTES']
+
+# documents saved by encode with `store` option, see encoder/models.py
+WEIRDTEXT_DOCUMENTS = {
+    'RETENTION': 7 * 24 * 60 * 60,
+    'MAX_DOCUMENTS': 100_000,
+}
+
 # unsecure for task presentation
 SWAGGER_SETTINGS = {
-   'USE_SESSION_AUTH': False
+   'USE_SESSION_AUTH': False,
+   'DEFAULT_INFO': 'swagger.swagger.api_info',
+   # schema pre-generated by `generate_swagger` (see entrypoint.sh) and served
+   # as static file, without it swagger UI loads schema generated by the view
+   'SPEC_URL': os.environ.get('WEIRDTEXT_SCHEMA_URL'),
 }
+# schema view (UI and `?format=openapi`) is generated once per process and cached
+WEIRDTEXT_SCHEMA_CACHE_TIMEOUT = 24 * 60 * 60
@@ -17,8 +17,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
 
+from encoder.views import metrics_view
 
 urlpatterns = [
     path('v1/', include('encoder.urls')),
     path('doc/', include('swagger.urls')),
+    path('metrics', metrics_view),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)